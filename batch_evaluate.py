@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Nightly offline evaluation through the OpenAI Batch API
+Re-answers the last day's text questions with the bot's current prompt, context
+and model settings. Batch requests cost half as much and use a separate rate
+limit pool; the 24h turnaround doesn't matter for offline analysis.
+"""
+# Fix SQLite version for ChromaDB (must be before any sqlite imports)
+from src import _sqlite_shim  # noqa: F401
+
+import io
+import os
+import sys
+import json
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from src import analytics
+from src.clients import get_openai_client
+from src.rag import RAGPipeline
+from src.bot import build_messages
+from src.routing import route_query
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Same index as main.py, wherever the script is run from
+CHROMA_DIR = Path(__file__).parent / "chroma_db"
+
+
+def build_requests(hours: int = 24) -> list:
+    """Build one Batch API request line per recent text question, with the bot's request parameters."""
+    rag = RAGPipeline(persist_directory=str(CHROMA_DIR))
+    model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    simple_model = os.getenv("LLM_SIMPLE_MODEL", model)
+    max_tokens = int(os.getenv("LLM_MAX_TOKENS", "1200"))
+    temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+
+    lines = []
+    for row in analytics.get_recent_queries(hours):
+        query = row['query_text']
+        context, _ = rag.get_context_pack(query)
+        query_model, query_max_tokens = route_query(query, model, simple_model, max_tokens)
+        lines.append({
+            "custom_id": f"query-{row['id']}",
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": query_model,
+                "messages": build_messages(query, context),
+                "temperature": temperature,
+                "max_tokens": query_max_tokens
+            }
+        })
+    return lines
+
+
+def submit(hours: int = 24):
+    """Upload the requests and start a batch."""
+    lines = build_requests(hours)
+    if not lines:
+        print(f"No queries in the last {hours} hours")
+        return
+
+    client = get_openai_client()
+    payload = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+    batch_file = client.files.create(
+        file=("batch_evaluate.jsonl", io.BytesIO(payload.encode("utf-8"))),
+        purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h"
+    )
+    print(f"Submitted batch {batch.id} with {len(lines)} requests")
+
+
+def collect(batch_id: str, output_path: str):
+    """Download a finished batch's answers as JSONL (custom_id, answer)."""
+    client = get_openai_client()
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed":
+        print(f"Batch {batch_id} is {batch.status}")
+        return
+
+    content = client.files.content(batch.output_file_id).text
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as f:
+        for line in content.splitlines():
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+            answer = response["body"]["choices"][0]["message"]["content"]
+            f.write(json.dumps({"custom_id": result["custom_id"], "answer": answer}, ensure_ascii=False) + "\n")
+            count += 1
+    print(f"Wrote {count} answers to {output_path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("submit", "collect"):
+        print("Usage: python batch_evaluate.py submit [hours]")
+        print("       python batch_evaluate.py collect <batch_id> [output.jsonl]")
+        sys.exit(1)
+
+    if sys.argv[1] == "submit":
+        submit(int(sys.argv[2]) if len(sys.argv) > 2 else 24)
+    else:
+        if len(sys.argv) < 3:
+            print("Usage: python batch_evaluate.py collect <batch_id> [output.jsonl]")
+            sys.exit(1)
+        collect(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else f"batch_{sys.argv[2]}.jsonl")
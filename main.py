@@ -4,11 +4,10 @@ TransitoColBot - Colombian Transit Law Telegram Bot
 Enhanced version with multi-document RAG
 """
 # Fix SQLite version for ChromaDB (must be before any sqlite imports)
-__import__('pysqlite3')
-import sys
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+from src import _sqlite_shim  # noqa: F401
 
 import os
+import sys
 import logging
 from pathlib import Path
 
@@ -17,9 +16,10 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# Configure logging
+# Configure logging (LOG_LEVEL=WARNING also silences the startup banners)
+LOG_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.FileHandler('transito-bot.log'),
@@ -31,8 +31,15 @@ logger = logging.getLogger(__name__)
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.rag import initialize_rag
-from src.bot import create_bot
+# src.rag and src.bot are imported inside main(): they pull in ChromaDB,
+# LangChain, OpenAI and python-telegram-bot, which is wasted work if the
+# environment check fails.
+
+
+def banner(message: str = "") -> None:
+    """Print a startup message unless logging is quieter than INFO."""
+    if LOG_LEVEL <= logging.INFO:
+        print(message)
 
 
 def validate_environment() -> bool:
@@ -54,10 +61,10 @@ def validate_environment() -> bool:
 
 def main():
     """Main entry point."""
-    print("=" * 60)
-    print("🚗 TransitoColBot - Colombian Transit Law Assistant")
-    print("   Enhanced RAG with multi-document support")
-    print("=" * 60)
+    banner("=" * 60)
+    banner("🚗 TransitoColBot - Colombian Transit Law Assistant")
+    banner("   Enhanced RAG with multi-document support")
+    banner("=" * 60)
     
     # Validate environment
     if not validate_environment():
@@ -77,26 +84,29 @@ def main():
         project_dir / "docs" / "compendio_normativo.txt",
     ]
     
-    print("\n📂 Checking documents...")
+    banner("\n📂 Checking documents...")
     for doc in required_docs:
         if not doc.exists():
             logger.error(f"Required document not found: {doc}")
             print(f"  ❌ {doc.name} (REQUIRED)")
             sys.exit(1)
-        print(f"  ✅ {doc.name}")
+        banner(f"  ✅ {doc.name}")
     
     for doc in optional_docs:
         if doc.exists():
-            print(f"  ✅ {doc.name}")
+            banner(f"  ✅ {doc.name}")
         else:
-            print(f"  ⚪ {doc.name} (optional, not found)")
+            banner(f"  ⚪ {doc.name} (optional, not found)")
     
     # Initialize RAG pipeline
-    print("\n📚 Initializing enhanced RAG pipeline...")
-    print("   This may take a moment for first-time indexing...")
+    banner("\n📚 Initializing enhanced RAG pipeline...")
+    banner("   This may take a moment for first-time indexing...")
+    
+    from src.rag import initialize_rag
+    from src.bot import create_bot
     
     try:
-        # Check if we need to force reindex (if collection name changed)
+        # Check if we need to force reindex (collection name or HNSW parameters changed)
         force_reindex = os.getenv("FORCE_REINDEX", "").lower() == "true"
         
         rag = initialize_rag(
@@ -106,12 +116,12 @@ def main():
         )
         
         stats = rag.get_stats()
-        print(f"\n✅ RAG pipeline ready!")
-        print(f"   Total chunks indexed: {stats['total_chunks']}")
-        print("   Sources:")
+        banner(f"\n✅ RAG pipeline ready!")
+        banner(f"   Total chunks indexed: {stats['total_chunks']}")
+        banner("   Sources:")
         for source, count in stats['by_source'].items():
             if count > 0:
-                print(f"     • {source}: {count} chunks")
+                banner(f"     • {source}: {count} chunks")
         
     except Exception as e:
         logger.error(f"Failed to initialize RAG pipeline: {e}")
@@ -120,11 +130,11 @@ def main():
     
     # Show LLM configuration
     llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
-    print(f"\n🤖 LLM Model: {llm_model}")
+    banner(f"\n🤖 LLM Model: {llm_model}")
     
     # Create and run bot
-    print("\n🚀 Starting Telegram bot...")
-    print("   Press Ctrl+C to stop.\n")
+    banner("\n🚀 Starting Telegram bot...")
+    banner("   Press Ctrl+C to stop.\n")
     
     try:
         bot = create_bot(rag)
@@ -0,0 +1,14 @@
+"""
+Swap in pysqlite3 as sqlite3 for ChromaDB, which needs SQLite >= 3.35
+(older systems such as CentOS/RHEL ship an older libsqlite3).
+Import this before anything imports sqlite3 or chromadb.
+"""
+import sys
+
+if getattr(sys.modules.get("sqlite3"), "__name__", None) != "pysqlite3":
+    try:
+        __import__('pysqlite3')
+        sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+    except ImportError:
+        # pysqlite3-binary not installed: rely on the system SQLite being recent enough
+        pass
@@ -3,20 +3,114 @@ Simple SQLite-based analytics for the Transito HP Bot
 """
 import sqlite3
 import os
-from datetime import datetime, timedelta
-from typing import Optional
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone, date
+from typing import Optional, Dict, Tuple
 from pathlib import Path
 
+from .cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
 DB_PATH = Path(__file__).parent.parent / "analytics.db"
 
+# track_query rows are queued and written by a background thread every
+# FLUSH_INTERVAL seconds, at most FLUSH_BATCH_SIZE rows per transaction
+FLUSH_INTERVAL = 0.2
+FLUSH_BATCH_SIZE = 500
+
+_local = threading.local()
+_WRITE_Q: "queue.SimpleQueue[Tuple[str, tuple]]" = queue.SimpleQueue()  # (db_path, query_row)
+_write_lock = threading.Lock()
+_flush_event = threading.Event()
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+
+# Rate-limited query types and the per-user counters for today (UTC, matching
+# SQLite's date('now')). Seeded from the database on a user's first check of
+# the day, then kept current by track_query. Counters from earlier days are
+# dropped at the first check after midnight, so memory follows daily actives.
+RATE_LIMITED_TYPES = ('text', 'voice')
+_DAILY: Dict[int, Tuple[date, int]] = {}
+_daily_day: Optional[date] = None
+_daily_lock = threading.Lock()
+
 
 def get_connection():
-    """Get database connection."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Get this thread's persistent database connection."""
+    return _thread_connection(str(DB_PATH))
+
+
+def _thread_connection(db_path: str):
+    """Get or open this thread's connection to db_path."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        # Autocommit mode; writes use explicit transactions via _transaction()
+        conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")
+        conn.execute("PRAGMA mmap_size=268435456")
+        connections[db_path] = conn
     return conn
 
 
+@contextmanager
+def _transaction(conn):
+    """Run the enclosed statements in a single transaction."""
+    conn.execute("BEGIN")
+    try:
+        yield conn.cursor()
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+_UPSERT_USER_SQL = """
+        INSERT INTO users (user_id, username, first_name, last_name, first_seen, last_seen)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = COALESCE(excluded.username, users.username),
+            first_name = COALESCE(excluded.first_name, users.first_name),
+            last_name = COALESCE(excluded.last_name, users.last_name),
+            last_seen = CURRENT_TIMESTAMP
+"""
+
+
+_TOUCH_USER_SQL = "UPDATE users SET last_seen = CURRENT_TIMESTAMP WHERE user_id = ?"
+
+# Last (username, first_name) written per user. When a query carries nothing
+# new, only last_seen needs bumping, which skips the COALESCE upsert. Bounded
+# so memory stays flat; an evicted user just gets the full upsert again.
+KNOWN_USERS_MAXSIZE = 10000
+_KNOWN_USERS = LRUCache(maxsize=KNOWN_USERS_MAXSIZE)  # user_id -> (username, first_name)
+
+
+def _is_known(user_id: int, username: Optional[str], first_name: Optional[str]) -> bool:
+    """Whether the stored user record already matches (None never overwrites)."""
+    known = _KNOWN_USERS.get(user_id)
+    if known is None:
+        return False
+    return (username is None or username == known[0]) and (first_name is None or first_name == known[1])
+
+
+def _remember_user(user_id: int, username: Optional[str], first_name: Optional[str]):
+    """Record the values an upsert left in the users table."""
+    known = _KNOWN_USERS.get(user_id) or (None, None)
+    _KNOWN_USERS.put(user_id, (username or known[0], first_name or known[1]))
+
+
 def init_db():
     """Initialize the analytics database."""
     conn = get_connection()
@@ -34,63 +128,129 @@ def init_db():
         )
     """)
     
-    cursor.execute("""
+    # STRICT (SQLite >= 3.37) skips type-affinity conversion on every upsert;
+    # it only applies to newly created databases
+    strict = " STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else ""
+    cursor.execute(f"""
         CREATE TABLE IF NOT EXISTS users (
             user_id INTEGER PRIMARY KEY,
             username TEXT,
             first_name TEXT,
             last_name TEXT,
-            first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-            last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
+            first_seen TEXT DEFAULT CURRENT_TIMESTAMP,
+            last_seen TEXT DEFAULT CURRENT_TIMESTAMP
+        ){strict}
     """)
     
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_queries_user_id ON queries(user_id)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_queries_timestamp ON queries(timestamp)")
-    
-    conn.commit()
-    conn.close()
+    # Per-user lookups filter on user_id, query_type and a timestamp range
+    # together; global counts only on timestamp. These two indexes replace the
+    # original single-column ones.
+    cursor.execute("DROP INDEX IF EXISTS idx_queries_user_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_queries_timestamp")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_queries_user_type_ts ON queries(user_id, query_type, timestamp DESC)"
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_queries_ts ON queries(timestamp DESC)")
 
 
 def track_user(user_id: int, username: Optional[str], first_name: Optional[str], last_name: Optional[str] = None):
     """Track or update a user."""
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO users (user_id, username, first_name, last_name, first_seen, last_seen)
-        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        ON CONFLICT(user_id) DO UPDATE SET
-            username = COALESCE(excluded.username, users.username),
-            first_name = COALESCE(excluded.first_name, users.first_name),
-            last_name = COALESCE(excluded.last_name, users.last_name),
-            last_seen = CURRENT_TIMESTAMP
-    """, (user_id, username, first_name, last_name))
-    
-    conn.commit()
-    conn.close()
+    with _transaction(conn) as cursor:
+        cursor.execute(_UPSERT_USER_SQL, (user_id, username, first_name, last_name))
+    _remember_user(user_id, username, first_name)
 
 
 def track_query(user_id: int, username: Optional[str], first_name: Optional[str], 
                 query_type: str, query_text: Optional[str] = None):
-    """Track a query."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO queries (user_id, username, first_name, query_type, query_text)
-        VALUES (?, ?, ?, ?, ?)
-    """, (user_id, username, first_name, query_type, query_text[:500] if query_text else None))
+    """
+    Track a query.
     
-    conn.commit()
-    conn.close()
+    The row is queued and written by a background thread together with any
+    other queries received within FLUSH_INTERVAL; readers flush first.
+    """
+    row = (user_id, username, first_name, query_type, query_text[:500] if query_text else None)
+    # Queue and count under one lock so a check never sees a counted row unqueued
+    with _daily_lock:
+        _WRITE_Q.put((str(DB_PATH), row))
+        if query_type in RATE_LIMITED_TYPES:
+            day, count = _DAILY.get(user_id, (None, 0))
+            if day == _today():
+                _DAILY[user_id] = (day, count + 1)
+    _ensure_flusher()
+    _flush_event.set()
+
+
+def flush():
+    """Write all queued queries (and their user records) to the database."""
+    with _write_lock:
+        while True:
+            batch = _drain_queue(FLUSH_BATCH_SIZE)
+            if not batch:
+                return
+            _write_batch(batch)
+
+
+def _drain_queue(limit: int) -> list:
+    """Take up to limit queued rows without blocking."""
+    batch = []
+    while len(batch) < limit:
+        try:
+            batch.append(_WRITE_Q.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write_batch(batch: list):
+    """Insert one batch of queued rows, one transaction per database."""
+    by_path = {}
+    for db_path, row in batch:
+        by_path.setdefault(db_path, []).append(row)
     
-    # Also update user record
-    track_user(user_id, username, first_name)
+    for db_path, rows in by_path.items():
+        conn = _thread_connection(db_path)
+        with _transaction(conn) as cursor:
+            cursor.executemany("""
+                INSERT INTO queries (user_id, username, first_name, query_type, query_text)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            # Also update user records, once per user per batch
+            users = {user_id: (username, first_name) for user_id, username, first_name, _, _ in rows}
+            for user_id, (username, first_name) in users.items():
+                if _is_known(user_id, username, first_name):
+                    cursor.execute(_TOUCH_USER_SQL, (user_id,))
+                    if cursor.rowcount:
+                        continue
+                cursor.execute(_UPSERT_USER_SQL, (user_id, username, first_name, None))
+                _remember_user(user_id, username, first_name)
+
+
+def _flush_loop():
+    """Background writer: wait for queued queries, coalesce briefly, flush."""
+    while True:
+        _flush_event.wait()
+        time.sleep(FLUSH_INTERVAL)
+        _flush_event.clear()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Analytics flush failed: {e}")
+
+
+def _ensure_flusher():
+    """Start the background writer thread on first use."""
+    global _flusher
+    if _flusher is None:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="analytics-flush", daemon=True)
+                _flusher.start()
 
 
 def get_stats() -> dict:
     """Get overall statistics."""
+    flush()
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -113,7 +273,7 @@ def get_stats() -> dict:
     # Today's queries
     cursor.execute("""
         SELECT COUNT(*) as total FROM queries 
-        WHERE date(timestamp) = date('now')
+        WHERE timestamp >= date('now') AND timestamp < date('now', '+1 day')
     """)
     today_queries = cursor.fetchone()['total']
     
@@ -142,8 +302,6 @@ def get_stats() -> dict:
     """)
     recent_users = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
-    
     return {
         'total_queries': total_queries,
         'unique_users': unique_users,
@@ -157,6 +315,7 @@ def get_stats() -> dict:
 
 def get_user_list() -> list:
     """Get list of all users."""
+    flush()
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -171,29 +330,66 @@ def get_user_list() -> list:
     """)
     
     users = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     
     return users
 
 
+def get_recent_queries(hours: int = 24, query_types: tuple = ('text',)) -> list:
+    """
+    Get the id and text of questions asked in the last `hours` hours, oldest
+    first. Voice queries are stored as '[voice message]', not their
+    transcript, so they are left out by default.
+    """
+    flush()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    placeholders = ", ".join("?" * len(query_types))
+    cursor.execute(f"""
+        SELECT id, query_text FROM queries
+        WHERE timestamp >= datetime('now', ?) AND query_type IN ({placeholders})
+        AND query_text IS NOT NULL AND query_text != ''
+        ORDER BY id
+    """, (f"-{int(hours)} hours", *query_types))
+    
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def _today() -> date:
+    """Current UTC date, as used by SQLite's date('now')."""
+    return datetime.now(timezone.utc).date()
+
+
 def get_user_daily_count(user_id: int) -> int:
     """Get number of queries a user has made today."""
+    flush()
     conn = get_connection()
     cursor = conn.cursor()
     
+    # Range on timestamp (not date(timestamp)) so idx_queries_user_type_ts applies
     cursor.execute("""
         SELECT COUNT(*) as count FROM queries 
         WHERE user_id = ? 
-        AND date(timestamp) = date('now')
         AND query_type IN ('text', 'voice')
+        AND timestamp >= date('now')
+        AND timestamp < date('now', '+1 day')
     """, (user_id,))
     
     count = cursor.fetchone()['count']
-    conn.close()
     
     return count
 
 
+def has_daily_count(user_id: int) -> bool:
+    """
+    Whether the user's count for today is already in memory, i.e. whether
+    check_rate_limit will answer without touching the database.
+    """
+    with _daily_lock:
+        day, _ = _DAILY.get(user_id, (None, 0))
+    return day == _today()
+
+
 def check_rate_limit(user_id: int, daily_limit: int = 10, admin_ids: list = None) -> tuple[bool, int]:
     """
     Check if user has exceeded daily rate limit.
@@ -207,7 +403,25 @@ def check_rate_limit(user_id: int, daily_limit: int = 10, admin_ids: list = None
     if admin_ids and user_id in admin_ids:
         return True, 999
     
-    daily_count = get_user_daily_count(user_id)
+    global _daily_day
+    today = _today()
+    with _daily_lock:
+        if _daily_day != today:
+            _DAILY.clear()
+            _daily_day = today
+        day, daily_count = _DAILY.get(user_id, (None, 0))
+    
+    if day != today:
+        # Seed outside the lock: the flush and COUNT must not block
+        # track_query/has_daily_count callers on the event loop. A query
+        # tracked meanwhile may or may not be in the seed, so the larger of
+        # the two counts wins.
+        seed = get_user_daily_count(user_id)
+        with _daily_lock:
+            day, current = _DAILY.get(user_id, (None, 0))
+            daily_count = max(seed, current) if day == today else seed
+            _DAILY[user_id] = (today, daily_count)
+    
     remaining = max(0, daily_limit - daily_count)
     is_allowed = daily_count < daily_limit
     
@@ -216,3 +430,4 @@ def check_rate_limit(user_id: int, daily_limit: int = 10, admin_ids: list = None
 
 # Initialize DB on import
 init_db()
+atexit.register(flush)
@@ -2,41 +2,206 @@
 TransitoColBot - Telegram Bot for Colombian Transit Law Q&A
 Enhanced version with comprehensive RAG, voice, and document generation
 """
+import io
 import os
+import re
+import asyncio
 import logging
+import shutil
+import wave
+import functools
+import subprocess
 import tempfile
-from typing import Optional, Tuple
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
 from pathlib import Path
+from urllib.parse import urlparse
 
+import numpy as np
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, CallbackQueryHandler,
-    ConversationHandler, filters, ContextTypes
+    AIORateLimiter, Application, BaseUpdateProcessor, CommandHandler, MessageHandler,
+    CallbackQueryHandler, ConversationHandler, TypeHandler, filters, ContextTypes
 )
 from telegram.constants import ParseMode, ChatAction
-from openai import OpenAI
+from telegram.request import HTTPXRequest
 
-from .rag import RAGPipeline
-from .document_generator import DerechoPeticionGenerator
+try:
+    from piper import PiperVoice
+except ImportError:  # optional local TTS (pip install piper-tts)
+    PiperVoice = None
+
+from .rag import (
+    RAGPipeline, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, QUERY_EMBEDDING_CACHE_SIZE, to_unit_float32
+)
+from .cache import SemanticCache, LRUCache, FileCache
+from .clients import get_async_openai_client, close_async_openai_client
+from .dispatcher import RequestDispatcher, EmbeddingBatcher
+from .document_generator import render_document
+from .replies import split_message
+from .concurrency import InFlight, ChatSerialProcessing
+from .routing import normalize_query, route_query
+from .transcription import merge_transcripts, VOICE_SEGMENT_OVERLAP_SECONDS
+from .document_flow import (
+    SELECTING_TEMPLATE, NOMBRE, HECHOS, CONFIRMAR,
+    DERECHO_PETICION_PATTERN, DOCUMENT_FIELDS, INVALID_FIELD_MESSAGE, store_answer
+)
 from . import analytics
 
 # Admin user IDs (Telegram)
 ADMIN_IDS = [935438639]  # Andres Garcia
 
-# Conversation states for document generation
-(SELECTING_TEMPLATE, NOMBRE, CEDULA, DIRECCION, TELEFONO, EMAIL, 
- CIUDAD, COMPARENDO, FECHA, PLACA, HECHOS, CONFIRMAR) = range(12)
+# /documento keyboards and template names; telegram objects are immutable, so
+# the markups are built once and shared by every conversation
+TEMPLATE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📅 Prescripción (multa > 3 años)", callback_data="doc_prescripcion")],
+    [InlineKeyboardButton("📬 Sin notificación oportuna", callback_data="doc_fotomulta_notificacion")],
+    [InlineKeyboardButton("👤 No identifican al conductor", callback_data="doc_fotomulta_identificacion")],
+    [InlineKeyboardButton("🚫 Sin señalización (500m)", callback_data="doc_fotomulta_señalizacion")],
+    [InlineKeyboardButton("❌ Cancelar", callback_data="doc_cancel")]
+])
+CONFIRM_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Generar PDF", callback_data="doc_generar")],
+    [InlineKeyboardButton("❌ Cancelar", callback_data="doc_cancel_final")]
+])
+TEMPLATE_NAMES = {
+    "prescripcion": "Prescripción de multa (Art. 159 Ley 769)",
+    "fotomulta_notificacion": "Nulidad por falta de notificación (Art. 8 Ley 1843)",
+    "fotomulta_identificacion": "Nulidad por no identificar conductor (C-038/2020)",
+    "fotomulta_señalizacion": "Nulidad por falta de señalización (Art. 5 Ley 1843)"
+}
+
+# Abandoned /documento conversations end (and drop their data) after this many seconds
+DOCUMENT_CONVERSATION_TIMEOUT = 600
+
+DOCUMENT_SUMMARY_TEMPLATE = """📄 *RESUMEN DE TU DOCUMENTO*
+
+👤 Nombre: {nombre}
+🆔 Cédula: {cedula}
+🏠 Dirección: {direccion}
+📱 Teléfono: {telefono}
+📧 Email: {email}
+🏙️ Ciudad autoridad: {ciudad}
+🔢 Comparendo: {comparendo}
+📅 Fecha infracción: {fecha}
+🚗 Placa: {placa}
 
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+¿Generar el documento PDF?"""
+DOCUMENT_READY_CAPTION = (
+    "📄 *¡Tu Derecho de Petición está listo!*\n\n"
+    "✅ Imprímelo y fírmalo\n"
+    "✅ Radícalo en la Secretaría de Tránsito\n"
+    "✅ Guarda copia con sello de radicado\n"
+    "✅ Tienen 15 días hábiles para responder\n\n"
+    "_Documento generado con fundamentos de la normativa colombiana vigente._"
 )
+
+# Configure logging unless the entry point (main.py) already did
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
 logger = logging.getLogger(__name__)
 
 # Rate limit configuration
 DAILY_QUERY_LIMIT = 10  # Free tier limit
 
+# Semantic answer cache: queries at cosine >= threshold reuse context and answers
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+# Saved on shutdown and reloaded on start while models and index are unchanged
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "./answer_cache.npz")
+# Exact answer cache keyed on (context pack version, normalized query, kind)
+RESPONSE_CACHE_SIZE = 512
+
+# Voice answers are streamed and synthesized in segments of about this many
+# characters, so TTS runs while the completion is still being generated
+TTS_SEGMENT_CHARS = 200
+TTS_MAX_CHARS = 4000
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])(?<!\d\.)\s+|\n+')  # not after "2." list numbers
+# Markdown stripped before synthesis, applied in order (bold before italic)
+TTS_MARKDOWN_PATTERNS = [
+    (re.compile(r'\*\*([^*]+)\*\*'), r'\1'),  # Bold
+    (re.compile(r'\*([^*]+)\*'), r'\1'),  # Italic
+    (re.compile(r'`([^`]+)`'), r'\1'),  # Code
+    (re.compile(r'#{1,6}\s*'), ''),  # Headers
+    (re.compile(r'\[([^\]]+)\]\([^)]+\)'), r'\1'),  # Links
+    (re.compile(r'^[-•]\s*', re.MULTILINE), ''),  # Bullets
+    (re.compile(r'^\d+\.\s*', re.MULTILINE), ''),  # Numbered lists
+]
+
+# Synthesized segments are cached on disk by text, so repeated answers and
+# fixed phrases are paid for once
+TTS_MODEL = "tts-1"
+TTS_VOICE = "nova"  # Clear Spanish pronunciation
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(1024 ** 3)))
+TTS_TRUNCATED_NOTICE = "Para más detalles, lee el mensaje de texto."
+# Fixed phrases synthesized at startup
+CANNED_TTS_PHRASES = (TTS_TRUNCATED_NOTICE,)
+# Short answers (a single segment) can be spoken by a local Piper voice instead
+# of a TTS round-trip; needs piper-tts, ffmpeg and PIPER_VOICE_PATH (.onnx)
+PIPER_VOICE_PATH = os.getenv("PIPER_VOICE_PATH")
+LOCAL_TTS_MAX_CHARS = 300
+
+# Domain vocabulary that biases Whisper's decoding toward legal terms
+WHISPER_PROMPT = "Código de tránsito, Ley 769, Decreto 2106, RUNT, SIMIT, comparendo, fotomulta"
+
+# Voice notes longer than this are cut into overlapping segments transcribed
+# in parallel (needs ffmpeg on PATH; without it they go to Whisper in one piece)
+LONG_VOICE_SECONDS = 30
+VOICE_SEGMENT_SECONDS = 25
+FFMPEG = shutil.which("ffmpeg")
+# Voice notes over these limits are turned away before download and Whisper
+MAX_VOICE_SECONDS = int(os.getenv("MAX_VOICE_SECONDS", "180"))
+MAX_VOICE_BYTES = 5 * 1024 * 1024
+# Whisper requests in flight across all users (long notes fan out into segments)
+WHISPER_CONCURRENCY = 8
+VOICE_TOO_LONG_MESSAGE = (
+    f"⚠️ El audio es muy largo (máximo {MAX_VOICE_SECONDS // 60} minutos). "
+    "Por favor envía una nota de voz más corta o escribe tu pregunta."
+)
+
+# Threads for blocking work (query embeddings, SQLite reads, cache files),
+# sized to the OpenAI connection headroom
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "32"))
+# Vector searches get their own smaller pool so a burst of queries can't take
+# every blocking thread (or oversubscribe Chroma's HNSW threads)
+RAG_WORKERS = int(os.getenv("RAG_WORKERS", "8"))
+# ReportLab rendering is CPU-bound and holds the GIL, so PDFs are rendered in
+# worker processes; a few of them keep concurrent /documento requests from
+# saturating the CPU
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "4"))
+
+# Telegram pushes updates to WEBHOOK_URL when it is set (behind an HTTPS reverse
+# proxy forwarding to WEBHOOK_PORT); otherwise the bot long-polls getUpdates
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_MAX_CONNECTIONS = 100
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+# Telegram Bot API connection pools: replies/uploads and getUpdates long polling
+# get separate pools so voice uploads never starve polling
+TELEGRAM_POOL_SIZE = 64
+TELEGRAM_UPDATES_POOL_SIZE = 4
+# Times a Bot API call is retried after Telegram answers with RetryAfter
+TELEGRAM_FLOOD_RETRIES = 2
+# Updates handled at once; PTB otherwise processes them one after another, so a
+# slow answer or PDF would hold up every other user. Updates from one chat
+# still run in order (ChatSerialUpdateProcessor)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "256"))
+
+# Text answers are streamed into the reply by editing it at most this often
+# (seconds), which stays within Telegram's per-chat edit limits
+STREAM_EDIT_INTERVAL = 1.0
+# The first edit goes out as soon as this much text has arrived
+STREAM_FIRST_EDIT_CHARS = 40
+
+GENERATION_ERROR_MESSAGE = "Lo siento, hubo un error procesando tu pregunta. Por favor intenta de nuevo."
+
 # Enhanced System Prompt with comprehensive legal knowledge
 SYSTEM_PROMPT = """Eres un asistente legal especializado en normativa de tránsito de Colombia. Tu nombre es TransitoColBot.
 
@@ -126,151 +291,8 @@ VOICE_SYSTEM_PROMPT = """Eres TransitoColBot, asistente de tránsito colombiano.
 - Habla de forma natural, como explicándole a un amigo
 - Máximo 3-4 puntos clave por respuesta"""
 
-
-class TransitoBot:
-    """
-    Enhanced Telegram Bot for Colombian Transit Law.
-    Features:
-    - Multi-source RAG retrieval
-    - Voice input (Whisper) and output (TTS)
-    - PDF document generation
-    - Rate limiting and analytics
-    """
-    
-    def __init__(self, rag_pipeline: RAGPipeline, telegram_token: str):
-        """Initialize the Telegram bot with RAG pipeline."""
-        self.rag = rag_pipeline
-        self.telegram_token = telegram_token
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.doc_generator = DerechoPeticionGenerator()
-        self.application: Optional[Application] = None
-        self.user_data = {}  # Store user document data during conversation
-        
-        # LLM configuration
-        self.llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
-        self.llm_temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
-        self.llm_max_tokens = int(os.getenv("LLM_MAX_TOKENS", "1200"))
-        
-        logger.info(f"Bot initialized with model: {self.llm_model}")
-    
-    def _generate_response(
-        self, 
-        query: str, 
-        context: str,
-        system_prompt: str = SYSTEM_PROMPT,
-        max_tokens: Optional[int] = None
-    ) -> str:
-        """Generate a response using the LLM with retrieved context."""
-        user_message = f"""## Contexto de la Base de Conocimiento:
-
-{context}
-
----
-
-## Pregunta del usuario:
-{query}
-
-Responde basándote en el contexto proporcionado. Si la información no está disponible, indícalo claramente."""
-
-        try:
-            response = self.openai_client.chat.completions.create(
-                model=self.llm_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=self.llm_temperature,
-                max_tokens=max_tokens or self.llm_max_tokens
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"Error generating response: {e}")
-            return "Lo siento, hubo un error procesando tu pregunta. Por favor intenta de nuevo."
-    
-    def _transcribe_audio(self, audio_path: str) -> str:
-        """Transcribe audio file using OpenAI Whisper API."""
-        try:
-            with open(audio_path, "rb") as audio_file:
-                transcript = self.openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="es"
-                )
-            return transcript.text
-        except Exception as e:
-            logger.error(f"Error transcribing audio: {e}")
-            raise
-    
-    def _text_to_speech(self, text: str, output_path: str) -> bool:
-        """Convert text to speech using OpenAI TTS API."""
-        try:
-            # Limit text length for TTS
-            if len(text) > 4000:
-                text = text[:4000] + "... Para más detalles, lee el mensaje de texto."
-            
-            # Clean text for better TTS
-            text = self._clean_text_for_tts(text)
-            
-            response = self.openai_client.audio.speech.create(
-                model="tts-1",
-                voice="nova",  # Clear Spanish pronunciation
-                input=text,
-                response_format="opus"
-            )
-            
-            response.stream_to_file(output_path)
-            return True
-        except Exception as e:
-            logger.error(f"Error generating TTS: {e}")
-            return False
-    
-    def _clean_text_for_tts(self, text: str) -> str:
-        """Clean text for better TTS output."""
-        import re
-        # Remove markdown formatting
-        text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # Bold
-        text = re.sub(r'\*([^*]+)\*', r'\1', text)  # Italic
-        text = re.sub(r'`([^`]+)`', r'\1', text)  # Code
-        text = re.sub(r'#{1,6}\s*', '', text)  # Headers
-        text = re.sub(r'\[([^\]]+)\]\([^)]+\)', r'\1', text)  # Links
-        # Clean up bullets
-        text = re.sub(r'^[-•]\s*', '', text, flags=re.MULTILINE)
-        text = re.sub(r'^\d+\.\s*', '', text, flags=re.MULTILINE)
-        return text.strip()
-    
-    async def _check_rate_limit(self, user_id: int) -> Tuple[bool, int]:
-        """Check rate limit and return (is_allowed, remaining)."""
-        return analytics.check_rate_limit(
-            user_id, 
-            daily_limit=DAILY_QUERY_LIMIT, 
-            admin_ids=ADMIN_IDS
-        )
-    
-    async def _send_rate_limit_message(self, update: Update):
-        """Send rate limit exceeded message."""
-        await update.message.reply_text(
-            "❌ *Has alcanzado el límite diario de 10 consultas.*\n\n"
-            "Por favor vuelve mañana para continuar usando el bot. 🕐\n\n"
-            "💡 _Tip: Si necesitas acceso ilimitado, contacta al administrador._",
-            parse_mode=ParseMode.MARKDOWN
-        )
-    
-    async def _send_remaining_warning(self, update: Update, remaining: int):
-        """Send warning about remaining queries."""
-        if remaining <= 3 and remaining > 0:
-            await update.message.reply_text(
-                f"ℹ️ Te quedan *{remaining}* consulta{'s' if remaining > 1 else ''} hoy.",
-                parse_mode=ParseMode.MARKDOWN
-            )
-    
-    # ==================== COMMAND HANDLERS ====================
-    
-    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Handle /start command."""
-        user = update.effective_user
-        analytics.track_query(user.id, user.username, user.first_name, 'command', '/start')
-        
-        welcome_message = """🚗 *¡Bienvenido a TransitoColBot!*
+# Static command replies, built once at import
+WELCOME_MESSAGE = """🚗 *¡Bienvenido a TransitoColBot!*
 
 Soy tu asistente especializado en normativa de tránsito colombiana. Te ayudo con:
 
@@ -296,12 +318,8 @@ Escribe tu pregunta o envía un audio 🎤
 /help - Más información
 
 ¡Hazme tu pregunta!"""
-        
-        await update.message.reply_text(welcome_message, parse_mode=ParseMode.MARKDOWN)
-    
-    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Handle /help command."""
-        help_message = """📖 *Ayuda - TransitoColBot*
+
+HELP_MESSAGE = """📖 *Ayuda - TransitoColBot*
 
 *Comandos disponibles:*
 /start - Mensaje de bienvenida
@@ -333,14 +351,12 @@ Escribe tu pregunta o envía un audio 🎤
 *Límites:*
 • 10 consultas diarias (tier gratuito)
 • Admins tienen acceso ilimitado"""
-        
-        await update.message.reply_text(help_message, parse_mode=ParseMode.MARKDOWN)
-    
-    async def fuentes_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        """Handle /fuentes command - show indexed sources and normative hierarchy."""
-        stats = self.rag.get_stats()
-        
-        fuentes_text = """📚 *Fuentes Normativas Indexadas*
+
+# /fuentes and /stats reuse the index statistics (one Chroma query per source)
+# for this many seconds
+INDEX_STATS_TTL = 60.0
+
+FUENTES_HEADER = """📚 *Fuentes Normativas Indexadas*
 
 *JERARQUÍA NORMATIVA:*
 
@@ -376,37 +392,608 @@ Escribe tu pregunta o envía un audio 🎤
 
 📊 *Estadísticas del RAG:*
 """
+
+RATE_LIMIT_MESSAGE = (
+    "❌ *Has alcanzado el límite diario de 10 consultas.*\n\n"
+    "Por favor vuelve mañana para continuar usando el bot. 🕐\n\n"
+    "💡 _Tip: Si necesitas acceso ilimitado, contacta al administrador._"
+)
+
+QUERY_TYPE_EMOJIS = {'text': '💬', 'voice': '🎤', 'command': '⚡', 'document': '📄'}
+
+# Static instruction that follows the system prompt on every request
+CONTEXT_INSTRUCTIONS = (
+    "Responde basándote en el contexto proporcionado. "
+    "Si la información no está disponible, indícalo claramente."
+)
+
+# System messages are built once so every request starts with a byte-identical
+# prefix; OpenAI caches repeated prompt prefixes (>= 1024 tokens, which
+# SYSTEM_PROMPT alone exceeds) automatically. SYSTEM_PROMPT must stay static:
+# retrieved context and the question go in their own trailing user messages.
+SYSTEM_MESSAGES = {
+    SYSTEM_PROMPT: {"role": "system", "content": SYSTEM_PROMPT},
+    VOICE_SYSTEM_PROMPT: {"role": "system", "content": VOICE_SYSTEM_PROMPT},
+}
+CONTEXT_INSTRUCTIONS_MESSAGE = {"role": "system", "content": CONTEXT_INSTRUCTIONS}
+
+
+def split_audio(
+    audio: bytes,
+    duration: int,
+    segment_seconds: int = VOICE_SEGMENT_SECONDS,
+    overlap_seconds: int = VOICE_SEGMENT_OVERLAP_SECONDS
+) -> List[bytes]:
+    """
+    Cut OGG/Opus audio into segments starting every segment_seconds, each
+    running overlap_seconds into the next so a word at a cut is heard whole
+    by one of them. One ffmpeg pass with an output per segment (stream copy,
+    no re-encoding); the last one runs to the end. Blocking.
+    """
+    starts = range(0, max(duration - overlap_seconds, 1), segment_seconds)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source = os.path.join(tmp_dir, "voice.ogg")
+        with open(source, "wb") as f:
+            f.write(audio)
+        command = [FFMPEG, "-loglevel", "error", "-i", source]
+        parts = []
+        for i, start in enumerate(starts):
+            part = os.path.join(tmp_dir, f"part{i:03d}.ogg")
+            command += ["-map", "0:a", "-ss", str(start)]
+            if i < len(starts) - 1:
+                command += ["-t", str(segment_seconds + overlap_seconds)]
+            command += ["-c", "copy", part]
+            parts.append(part)
+        subprocess.run(command, check=True, timeout=60)
+        return [Path(part).read_bytes() for part in parts]
+
+
+def piper_to_mp3(voice, text: str) -> bytes:
+    """
+    Synthesize text with a Piper voice and encode it as 24 kHz mono MP3 (the
+    same shape as OpenAI TTS output). Blocking.
+    """
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, "wb") as wav_file:
+        voice.synthesize(text, wav_file)
+    result = subprocess.run(
+        [FFMPEG, "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+         "-ar", "24000", "-ac", "1", "-b:a", "48k", "-f", "mp3", "pipe:1"],
+        input=wav_buffer.getvalue(), capture_output=True, check=True, timeout=30
+    )
+    return result.stdout
+
+
+def build_messages(query: str, context: str, system_prompt: str = SYSTEM_PROMPT) -> List[dict]:
+    """
+    Build the chat messages for a query: static system messages first (the
+    cacheable prefix), then the retrieved context, then the question.
+    """
+    return [
+        SYSTEM_MESSAGES.get(system_prompt) or {"role": "system", "content": system_prompt},
+        CONTEXT_INSTRUCTIONS_MESSAGE,
+        {"role": "user", "content": f"## Contexto de la Base de Conocimiento:\n\n{context}"},
+        {"role": "user", "content": f"## Pregunta del usuario:\n{query}"}
+    ]
+
+
+async def _iter_sentences(text: str) -> AsyncIterator[str]:
+    """Split already generated text into sentences (same shape as a stream)."""
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        if sentence.strip():
+            yield sentence.strip()
+
+
+class ChatSerialUpdateProcessor(ChatSerialProcessing, BaseUpdateProcessor):
+    """
+    Handles updates from different chats concurrently but those of one chat
+    in arrival order. PTB's default processor gives no per-chat ordering, so
+    ConversationHandler state (the /documento steps) could be read and
+    advanced by two of a user's messages at once.
+    """
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass
+
+
+class TransitoBot:
+    """
+    Enhanced Telegram Bot for Colombian Transit Law.
+    Features:
+    - Multi-source RAG retrieval
+    - Voice input (Whisper) and output (TTS)
+    - PDF document generation
+    - Rate limiting and analytics
+    """
+    
+    def __init__(self, rag_pipeline: RAGPipeline, telegram_token: str):
+        """Initialize the Telegram bot with RAG pipeline."""
+        self.rag = rag_pipeline
+        self.telegram_token = telegram_token
+        # Async client on a pooled HTTP/2 connection so LLM, Whisper and TTS calls
+        # don't block the event loop while other users are being served
+        self.openai_client = get_async_openai_client()
+        # Chat completion streams from concurrent users share a concurrency bound and retries
+        self.dispatcher = RequestDispatcher(self.openai_client)
+        # Query embeddings from concurrent users share one list-input request
+        self.embedder = EmbeddingBatcher(self.openai_client, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+        self.query_embeddings = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+        self.executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="bot-blocking")
+        self.rag_executor = ThreadPoolExecutor(max_workers=RAG_WORKERS, thread_name_prefix="bot-rag")
+        # Spawned (not forked) workers: the bot process already runs threads
+        self.pdf_executor = ProcessPoolExecutor(
+            max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.answer_cache = SemanticCache(
+            dim=EMBEDDING_DIMENSIONS,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            maxsize=SEMANTIC_CACHE_SIZE
+        )
+        self.response_cache = LRUCache(maxsize=RESPONSE_CACHE_SIZE)
+        self.whisper_slots = asyncio.Semaphore(WHISPER_CONCURRENCY)
+        self._index_stats: Optional[Tuple[float, dict]] = None  # (loop time, stats)
+        # Text answers being generated right now, by response key; the same
+        # question from another user waits for that answer instead of a new call
+        self.pending_answers = InFlight()
+        self.tts_cache = FileCache(TTS_CACHE_DIR, suffix=".mp3", max_bytes=TTS_CACHE_MAX_BYTES)
+        self.local_tts = self._load_local_tts()
+        self.application: Optional[Application] = None
+        
+        # LLM configuration
+        self.llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.llm_temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+        self.llm_max_tokens = int(os.getenv("LLM_MAX_TOKENS", "1200"))
+        self.llm_simple_model = os.getenv("LLM_SIMPLE_MODEL", self.llm_model)
+        # Spoken answers are short and conversational, so a smaller model fits
+        self.llm_voice_model = os.getenv("LLM_VOICE_MODEL", self.llm_model)
+        
+        logger.info("Bot initialized with model: %s", self.llm_model)
+    
+    async def _stream_text(
+        self,
+        query: str,
+        context: str,
+        system_prompt: str = SYSTEM_PROMPT,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from the LLM, yielding text deltas as they arrive.
+        The model is routed by query complexity unless one is given.
+        """
+        routed_model, max_tokens = route_query(
+            query, self.llm_model, self.llm_simple_model, max_tokens or self.llm_max_tokens
+        )
+        model = model or routed_model
+        stream = self.dispatcher.stream(
+            model=model,
+            messages=build_messages(query, context, system_prompt),
+            temperature=self.llm_temperature,
+            max_tokens=max_tokens,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            elif chunk.usage is not None:  # final chunk, no choices
+                self._log_prompt_usage(chunk.usage)
+    
+    @staticmethod
+    def _log_prompt_usage(usage) -> None:
+        """Log how much of the prompt was served from OpenAI's prompt cache."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        if details is not None:
+            logger.debug(
+                "Prompt tokens: %s (cached: %s)",
+                usage.prompt_tokens, getattr(details, "cached_tokens", 0)
+            )
+    
+    async def _stream_sentences(
+        self,
+        query: str,
+        context: str,
+        system_prompt: str = SYSTEM_PROMPT,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a response from the LLM, yielding complete sentences as they arrive."""
+        buffer = ""
+        async for delta in self._stream_text(query, context, system_prompt, max_tokens, model):
+            buffer += delta
+            *sentences, buffer = SENTENCE_BOUNDARY.split(buffer)
+            for sentence in sentences:
+                if sentence.strip():
+                    yield sentence.strip()
+        if buffer.strip():
+            yield buffer.strip()
+    
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call on the bot's thread pool without stalling the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    async def _run_retrieval(self, func, *args, **kwargs):
+        """Run a blocking RAG call on the retrieval pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.rag_executor, functools.partial(func, *args, **kwargs))
+    
+    async def _run_rendering(self, func, *args, **kwargs):
+        """Run a PDF render on the worker process pool (func and arguments must pickle)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pdf_executor, functools.partial(func, *args, **kwargs))
+    
+    async def _transcribe_audio(self, audio: bytes, duration: int = 0) -> str:
+        """
+        Transcribe in-memory OGG audio using OpenAI Whisper API. Long voice
+        notes are split into segments that are transcribed concurrently.
+        """
+        try:
+            segments = [audio]
+            if duration > LONG_VOICE_SECONDS and FFMPEG:
+                segments = await self._run_blocking(split_audio, audio, duration)
+            texts = await asyncio.gather(*(self._transcribe_segment(s) for s in segments))
+            return merge_transcripts(texts)
+        except Exception as e:
+            logger.error("Error transcribing audio: %s", e)
+            raise
+    
+    async def _transcribe_segment(self, audio: bytes) -> str:
+        """Transcribe one OGG segment with Whisper."""
+        async with self.whisper_slots:
+            transcript = await self.openai_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=("voice.ogg", audio, "audio/ogg"),  # raw bytes, no file object
+                language="es",
+                prompt=WHISPER_PROMPT
+            )
+        return transcript.text
+    
+    def _load_local_tts(self):
+        """Load the optional Piper voice; None if not configured or available."""
+        if not (PIPER_VOICE_PATH and PiperVoice and FFMPEG):
+            return None
+        try:
+            voice = PiperVoice.load(PIPER_VOICE_PATH)
+            logger.info("Local TTS enabled: %s", PIPER_VOICE_PATH)
+            return voice
+        except Exception as e:
+            logger.warning("Could not load Piper voice, using OpenAI TTS: %s", e)
+            return None
+    
+    async def _synthesize_segment(self, text: str, local: bool = False) -> bytes:
+        """
+        Synthesize one segment of speech (disk-cached), with the local Piper
+        voice if requested and available, otherwise the OpenAI TTS API.
+        """
+        text = self._clean_text_for_tts(text)
+        local = local and self.local_tts is not None
+        key = f"piper:{PIPER_VOICE_PATH}:{text}" if local else f"{TTS_MODEL}:{TTS_VOICE}:{text}"
+        audio = await self._run_blocking(self.tts_cache.get, key)
+        if audio is not None:
+            return audio
+        if local:
+            audio = await self._run_blocking(piper_to_mp3, self.local_tts, text)
+        else:
+            response = await self.openai_client.audio.speech.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                input=text,
+                response_format="mp3"  # MP3 frames concatenate cleanly across segments
+            )
+            audio = response.content
+        await self._run_blocking(self.tts_cache.put, key, audio)
+        return audio
+    
+    async def _prewarm_connections(self) -> None:
+        """
+        Open the pooled HTTP/2 connection to the API with a cheap call, so the
+        first user request doesn't pay DNS and the TCP+TLS handshake.
+        """
+        try:
+            await self.openai_client.models.list()
+        except Exception as e:
+            logger.warning("Could not pre-warm OpenAI connection: %s", e)
+    
+    async def _prewarm_tts_cache(self) -> None:
+        """Synthesize the fixed phrases so they're cached before users need them."""
+        try:
+            await asyncio.gather(*(self._synthesize_segment(p) for p in CANNED_TTS_PHRASES))
+        except Exception as e:
+            logger.warning("Could not pre-warm TTS cache: %s", e)
+    
+    async def _text_to_speech(self, sentences: AsyncIterator[str]) -> Optional[Tuple[bytes, str]]:
+        """
+        Convert streamed sentences to speech. Each ~TTS_SEGMENT_CHARS segment is
+        synthesized as soon as it is complete; the audio is joined in order.
+        Returns (MP3 audio, full text spoken), or None on failure.
+        """
+        tasks = []
+        spoken = []
+        segment = ""
+        synthesized_chars = 0
+        try:
+            async for sentence in sentences:
+                spoken.append(sentence)
+                # Limit text length for TTS (keep collecting the text itself)
+                if synthesized_chars >= TTS_MAX_CHARS:
+                    continue
+                segment = f"{segment}\n{sentence}".strip()
+                if len(segment) >= TTS_SEGMENT_CHARS:
+                    tasks.append(asyncio.create_task(self._synthesize_segment(segment)))
+                    synthesized_chars += len(segment)
+                    segment = ""
+            
+            if segment:
+                # An answer that fits in one short segment never mixes voices,
+                # so it can be spoken locally
+                local = not tasks and len(segment) < LOCAL_TTS_MAX_CHARS
+                tasks.append(asyncio.create_task(self._synthesize_segment(segment, local=local)))
+            if synthesized_chars >= TTS_MAX_CHARS:
+                # Own segment, so its audio is always a cache hit
+                tasks.append(asyncio.create_task(self._synthesize_segment(TTS_TRUNCATED_NOTICE)))
+            
+            audio = await asyncio.gather(*tasks)
+            return b"".join(audio), "\n".join(spoken)
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            logger.error("Error generating TTS: %s", e)
+            return None
+    
+    async def _embed_query(self, query: str) -> np.ndarray:
+        """Embed a query (unit float32, read-only) through the batcher, reusing identical normalized queries."""
+        key = normalize_query(query)
+        embedding = self.query_embeddings.get(key)
+        if embedding is None:
+            embedding = to_unit_float32(await self.embedder.embed(key))
+            embedding.flags.writeable = False
+            self.query_embeddings.put(key, embedding)
+        return embedding
+    
+    async def _get_answer_entry(self, query: str) -> dict:
+        """
+        Get the semantic-cache entry for a query, retrieving RAG context on a miss.
+        Entries hold 'rag_context' (a deterministic context pack) and its
+        'context_version', plus the generated 'text'/'voice' answers.
+        """
+        # One embedding serves both the cache probe and the vector search
+        embedding = await self._embed_query(query)
+        entry = self.answer_cache.get(embedding)
+        if entry is None:
+            rag_context, version = await self._run_retrieval(
+                self.rag.get_context_pack_for_embedding, embedding, n_results=5
+            )
+            entry = {"rag_context": rag_context, "context_version": version}
+            self.answer_cache.put(embedding, entry)
+        return entry
+    
+    def _response_key(self, query: str, entry: dict, kind: str) -> tuple:
+        return (entry["context_version"], normalize_query(query), kind)
+    
+    def _get_cached_answer(self, query: str, entry: dict, kind: str = "text") -> Optional[str]:
+        """Get the 'text' or 'voice' answer from the entry or the response cache."""
+        if kind not in entry:
+            cached = self.response_cache.get(self._response_key(query, entry, kind))
+            if cached is not None:
+                entry[kind] = cached
+        return entry.get(kind)
+    
+    def _store_answer(self, query: str, entry: dict, kind: str, answer: str) -> None:
+        entry[kind] = answer
+        self.response_cache.put(self._response_key(query, entry, kind), answer)
+    
+    async def _reply_text_answer(self, update: Update, query: str, entry: dict) -> None:
+        """
+        Send the text answer. A cached answer is sent at once, and one already
+        being generated for another user is awaited; otherwise the completion
+        is streamed into a placeholder message that is edited as text arrives
+        (plain text while streaming, Markdown once complete).
+        """
+        cached = self._get_cached_answer(query, entry)
+        if cached is not None:
+            await self._send_answer(update.message.reply_text, cached)
+            return
         
-        total = stats.get('total_chunks', 0)
-        fuentes_text += f"Total fragmentos: {total}\n"
+        # Only the first caller for a response key generates; the same question
+        # from other users meanwhile waits for that answer (messages stays empty)
+        messages = []
         
-        by_source = stats.get('by_source', {})
-        for source, count in by_source.items():
-            if count > 0:
-                fuentes_text += f"• {source}: {count}\n"
+        async def generate() -> Optional[str]:
+            messages.append(await update.message.reply_text("⏳ ..."))
+            return await self._stream_into_messages(messages, update.message.reply_text, query, entry)
+        
+        led, response = await self.pending_answers.run(self._response_key(query, entry, "text"), generate)
+        if response is None:
+            if messages:
+                await messages[-1].edit_text(GENERATION_ERROR_MESSAGE)
+            else:
+                await update.message.reply_text(GENERATION_ERROR_MESSAGE)
+            return
+        if led:
+            self._store_answer(query, entry, "text", response)
+        await self._send_answer(update.message.reply_text, response, messages)
+    
+    async def _stream_into_messages(self, messages: list, reply, query: str, entry: dict) -> Optional[str]:
+        """
+        Stream the completion into messages[-1] with throttled edits. When the
+        text outgrows one message (split_message), the full part is settled
+        as Markdown and streaming continues in a new message sent with reply
+        and appended to messages. Returns the full answer, or None if
+        generation failed or produced no text.
+        """
+        loop = asyncio.get_running_loop()
+        response = ""
+        shown = ""
+        last_edit = None
+        try:
+            async for delta in self._stream_text(query, entry["rag_context"]):
+                response += delta
+                if last_edit is None:
+                    due = len(response) >= STREAM_FIRST_EDIT_CHARS
+                else:
+                    due = loop.time() - last_edit >= STREAM_EDIT_INTERVAL
+                if not due:
+                    continue
+                parts = split_message(response.strip())
+                while len(messages) < len(parts):
+                    await self._send_markdown(messages[-1].edit_text, parts[len(messages) - 1])
+                    messages.append(await reply("⏳ ..."))
+                    shown = ""
+                if parts and parts[-1] != shown:
+                    shown = parts[-1]
+                    await messages[-1].edit_text(f"{shown} ▌")
+                    last_edit = loop.time()
+        except Exception as e:
+            logger.error("Error generating response: %s", e)
+            return None
+        return response if response.strip() else None
+    
+    async def _send_answer(self, reply, text: str, messages: Optional[list] = None) -> None:
+        """
+        Send an answer as Markdown, one message per split_message part. With
+        the messages it was streamed into, the last of them is edited into its
+        final part (earlier ones were settled while streaming) and only parts
+        beyond them are sent with reply.
+        """
+        parts = split_message(text.strip())
+        if messages:
+            settled = min(len(messages), len(parts))
+            await self._send_markdown(messages[settled - 1].edit_text, parts[settled - 1])
+            parts = parts[settled:]
+        for part in parts:
+            await self._send_markdown(reply, part)
+    
+    @staticmethod
+    async def _send_markdown(send, text: str) -> None:
+        """Send (or edit in) text as Markdown, falling back to plain text if it doesn't parse."""
+        try:
+            await send(text, parse_mode=ParseMode.MARKDOWN)
+        except Exception:
+            await send(text)
+    
+    async def _synthesize_voice_answer(self, query: str, entry: dict) -> Optional[bytes]:
+        """
+        Render the conversational voice answer as MP3 audio, streaming the
+        completion into TTS unless a cached voice answer exists.
+        """
+        cached = self._get_cached_answer(query, entry, "voice")
+        if cached is not None:
+            sentences = _iter_sentences(cached)
+        else:
+            sentences = self._stream_sentences(
+                query,
+                entry["rag_context"],
+                system_prompt=VOICE_SYSTEM_PROMPT,
+                max_tokens=600,
+                model=self.llm_voice_model
+            )
         
-        await update.message.reply_text(fuentes_text, parse_mode=ParseMode.MARKDOWN)
+        result = await self._text_to_speech(sentences)
+        if result is None:
+            return None
+        audio, spoken = result
+        if cached is None:
+            self._store_answer(query, entry, "voice", spoken)
+        return audio
+    
+    def _clean_text_for_tts(self, text: str) -> str:
+        """Clean text for better TTS output."""
+        for pattern, replacement in TTS_MARKDOWN_PATTERNS:
+            text = pattern.sub(replacement, text)
+        return text.strip()
+    
+    async def _get_index_stats(self) -> dict:
+        """Get the RAG index statistics, refreshed at most every INDEX_STATS_TTL seconds."""
+        now = asyncio.get_running_loop().time()
+        if self._index_stats is None or now - self._index_stats[0] >= INDEX_STATS_TTL:
+            self._index_stats = (now, await self._run_blocking(self.rag.get_stats))
+        return self._index_stats[1]
+    
+    async def _check_rate_limit(self, user_id: int) -> Tuple[bool, int]:
+        """Check rate limit and return (is_allowed, remaining)."""
+        # In-memory once seeded; only the first check of the day reads SQLite
+        if user_id in ADMIN_IDS or analytics.has_daily_count(user_id):
+            return analytics.check_rate_limit(
+                user_id, 
+                daily_limit=DAILY_QUERY_LIMIT, 
+                admin_ids=ADMIN_IDS
+            )
+        return await self._run_blocking(
+            analytics.check_rate_limit,
+            user_id,
+            daily_limit=DAILY_QUERY_LIMIT,
+            admin_ids=ADMIN_IDS
+        )
+    
+    async def _send_rate_limit_message(self, update: Update):
+        """Send rate limit exceeded message."""
+        logger.debug("Rate limited user %s", update.effective_user.id)
+        await update.message.reply_text(RATE_LIMIT_MESSAGE, parse_mode=ParseMode.MARKDOWN)
+    
+    async def _send_remaining_warning(self, update: Update, remaining: int):
+        """Send warning about remaining queries."""
+        if remaining <= 3 and remaining > 0:
+            await update.message.reply_text(
+                f"ℹ️ Te quedan *{remaining}* consulta{'s' if remaining > 1 else ''} hoy.",
+                parse_mode=ParseMode.MARKDOWN
+            )
+    
+    # ==================== COMMAND HANDLERS ====================
+    
+    async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /start command."""
+        user = update.effective_user
+        analytics.track_query(user.id, user.username, user.first_name, 'command', '/start')
+        
+        await update.message.reply_text(WELCOME_MESSAGE, parse_mode=ParseMode.MARKDOWN)
+    
+    async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /help command."""
+        await update.message.reply_text(HELP_MESSAGE, parse_mode=ParseMode.MARKDOWN)
+    
+    async def fuentes_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Handle /fuentes command - show indexed sources and normative hierarchy."""
+        stats = await self._get_index_stats()
+        
+        lines = [FUENTES_HEADER, f"Total fragmentos: {stats.get('total_chunks', 0)}\n"]
+        lines.extend(
+            f"• {source}: {count}\n"
+            for source, count in stats.get('by_source', {}).items()
+            if count > 0
+        )
+        
+        await update.message.reply_text("".join(lines), parse_mode=ParseMode.MARKDOWN)
     
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle /stats command - show usage statistics (admin only)."""
         if update.effective_user.id not in ADMIN_IDS:
             return
         
-        stats = analytics.get_stats()
-        rag_stats = self.rag.get_stats()
+        stats, rag_stats = await asyncio.gather(
+            self._run_blocking(analytics.get_stats),
+            self._get_index_stats()
+        )
         
         # Format top users
-        top_users_text = ""
-        for i, u in enumerate(stats['top_users'][:5], 1):
-            name = u['first_name'] or u['username'] or f"User {u['user_id']}"
-            top_users_text += f"  {i}. {name}: {u['query_count']} consultas\n"
+        top_users_text = "".join(
+            f"  {i}. {u['first_name'] or u['username'] or 'User ' + str(u['user_id'])}: "
+            f"{u['query_count']} consultas\n"
+            for i, u in enumerate(stats['top_users'][:5], 1)
+        )
+        
+        # Semantic answer cache effectiveness (tune SEMANTIC_CACHE_THRESHOLD with this)
+        cache = self.answer_cache
+        lookups = cache.hits + cache.misses
+        hit_rate = cache.hits / lookups * 100 if lookups else 0.0
         
         # Format by type
-        by_type_text = ""
-        type_emojis = {'text': '💬', 'voice': '🎤', 'command': '⚡', 'document': '📄'}
-        for qtype, count in stats['by_type'].items():
-            emoji = type_emojis.get(qtype, '•')
-            by_type_text += f"  {emoji} {qtype}: {count}\n"
+        by_type_text = "".join(
+            f"  {QUERY_TYPE_EMOJIS.get(qtype, '•')} {qtype}: {count}\n"
+            for qtype, count in stats['by_type'].items()
+        )
         
         stats_message = f"""📊 *Estadísticas del Bot*
 
@@ -425,6 +1012,7 @@ Escribe tu pregunta o envía un audio 🎤
 *RAG:*
 • Modelo: {self.llm_model}
 • Chunks indexados: {rag_stats['total_chunks']}
+• Caché de respuestas: {len(cache)} preguntas, {hit_rate:.0f}% aciertos ({cache.hits}/{lookups})
 
 *Usuarios recientes (24h):* {len(stats['recent_users'])}
 """
@@ -454,42 +1042,34 @@ Escribe tu pregunta o envía un audio 🎤
         analytics.track_query(user.id, user.username, user.first_name, 'command', f'/voz {user_query}')
         await self._send_remaining_warning(update, remaining)
         
-        logger.info(f"Voice query from user {user_id}: {user_query}")
-        await update.message.chat.send_action(ChatAction.TYPING)
+        logger.info("Voice query from user %s: %s", user_id, user_query)
         
         try:
-            # Process through RAG pipeline
-            rag_context = self.rag.get_context_for_query(user_query, n_results=5)
-            
-            # Generate text response
-            response = self._generate_response(user_query, rag_context)
-            await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
-            
-            # Generate voice response with conversational prompt
-            voice_response = self._generate_response(
-                user_query, 
-                rag_context, 
-                system_prompt=VOICE_SYSTEM_PROMPT,
-                max_tokens=600
+            # Process through RAG pipeline (or reuse a semantically equivalent
+            # query) while the typing indicator is sent
+            _, entry = await asyncio.gather(
+                update.message.chat.send_action(ChatAction.TYPING),
+                self._get_answer_entry(user_query)
             )
             
-            with tempfile.NamedTemporaryFile(suffix=".opus", delete=False) as tmp_file:
-                voice_path = tmp_file.name
+            # Text answer and voice answer (conversational prompt + TTS) are
+            # independent, so generate them concurrently
+            _, voice_audio = await asyncio.gather(
+                self._reply_text_answer(update, user_query, entry),
+                self._synthesize_voice_answer(user_query, entry)
+            )
             
-            if self._text_to_speech(voice_response, voice_path):
-                try:
-                    await update.message.chat.send_action(ChatAction.RECORD_VOICE)
-                    await update.message.reply_voice(voice=open(voice_path, "rb"))
-                    logger.info(f"Sent voice response to user {user_id}")
-                finally:
-                    Path(voice_path).unlink(missing_ok=True)
+            if voice_audio:
+                await update.message.chat.send_action(ChatAction.RECORD_VOICE)
+                await update.message.reply_voice(voice=voice_audio, filename="respuesta.mp3")
+                logger.info("Sent voice response to user %s", user_id)
             else:
                 await update.message.reply_text(
                     "⚠️ No pude generar el audio, pero ahí está la respuesta en texto."
                 )
                 
         except Exception as e:
-            logger.error(f"Error handling /voz command: {e}")
+            logger.error("Error handling /voz command: %s", e)
             await update.message.reply_text(
                 "Lo siento, hubo un error. Por favor intenta de nuevo."
             )
@@ -500,73 +1080,68 @@ Escribe tu pregunta o envía un audio 🎤
         """Handle incoming voice messages."""
         user = update.effective_user
         user_id = user.id
-        logger.info(f"Voice message from user {user_id}")
         
-        # Rate limit check
+        # Rate limit check first: rejected messages skip logging and analytics
         is_allowed, remaining = await self._check_rate_limit(user_id)
         if not is_allowed:
             await self._send_rate_limit_message(update)
             return
         
+        # Oversized notes are rejected before they cost a download, Whisper
+        # time or one of the user's daily queries
+        voice = update.message.voice
+        if (voice.duration or 0) > MAX_VOICE_SECONDS or (voice.file_size or 0) > MAX_VOICE_BYTES:
+            await update.message.reply_text(VOICE_TOO_LONG_MESSAGE)
+            return
+        
+        logger.info("Voice message from user %s", user_id)
         analytics.track_query(user.id, user.username, user.first_name, 'voice', '[voice message]')
         await self._send_remaining_warning(update, remaining)
         
-        await update.message.chat.send_action(ChatAction.TYPING)
-        
         try:
-            # Download voice file
-            voice = update.message.voice
-            file = await context.bot.get_file(voice.file_id)
+            # Download voice file into memory (no temp file round-trip) while
+            # the typing indicator is sent
+            _, audio = await asyncio.gather(
+                update.message.chat.send_action(ChatAction.TYPING),
+                self._download_voice(context, voice.file_id)
+            )
             
-            with tempfile.NamedTemporaryFile(suffix=".ogg", delete=False) as tmp_file:
-                tmp_path = tmp_file.name
-                await file.download_to_drive(tmp_path)
+            # Transcribe audio
+            logger.info("Transcribing voice message from user %s", user_id)
+            transcribed_text = await self._transcribe_audio(audio, duration=voice.duration)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Transcribed: %s...", transcribed_text[:100])
             
-            try:
-                # Transcribe audio
-                logger.info(f"Transcribing voice message from user {user_id}")
-                transcribed_text = self._transcribe_audio(tmp_path)
-                logger.info(f"Transcribed: {transcribed_text[:100]}...")
-                
-                # Show user what we understood
-                await update.message.reply_text(
+            # Show user what we understood while the RAG pipeline runs
+            _, entry = await asyncio.gather(
+                update.message.reply_text(
                     f"🎤 *Entendí:* _{transcribed_text}_\n\n⏳ Buscando respuesta...",
                     parse_mode=ParseMode.MARKDOWN
-                )
-                
-                # Process through RAG pipeline
-                rag_context = self.rag.get_context_for_query(transcribed_text, n_results=5)
-                response = self._generate_response(transcribed_text, rag_context)
-                
-                # Send text response
-                await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
-                
-                # Generate and send voice response
-                voice_response = self._generate_response(
-                    transcribed_text,
-                    rag_context,
-                    system_prompt=VOICE_SYSTEM_PROMPT,
-                    max_tokens=600
-                )
-                
-                voice_path = tmp_path.replace(".ogg", "_response.opus")
-                if self._text_to_speech(voice_response, voice_path):
-                    try:
-                        await update.message.reply_voice(voice=open(voice_path, "rb"))
-                        logger.info(f"Sent voice response to user {user_id}")
-                    finally:
-                        Path(voice_path).unlink(missing_ok=True)
-                
-            finally:
-                Path(tmp_path).unlink(missing_ok=True)
+                ),
+                self._get_answer_entry(transcribed_text)
+            )
+            
+            # Send text response while the voice response is generated
+            _, voice_audio = await asyncio.gather(
+                self._reply_text_answer(update, transcribed_text, entry),
+                self._synthesize_voice_answer(transcribed_text, entry)
+            )
+            if voice_audio:
+                await update.message.reply_voice(voice=voice_audio, filename="respuesta.mp3")
+                logger.info("Sent voice response to user %s", user_id)
                 
         except Exception as e:
-            logger.error(f"Error handling voice message: {e}")
+            logger.error("Error handling voice message: %s", e)
             await update.message.reply_text(
                 "Lo siento, hubo un error procesando tu mensaje de voz. "
                 "Por favor intenta de nuevo o escribe tu pregunta."
             )
     
+    async def _download_voice(self, context: ContextTypes.DEFAULT_TYPE, file_id: str) -> bytes:
+        """Download a Telegram voice note into memory."""
+        file = await context.bot.get_file(file_id)
+        return bytes(await file.download_as_bytearray())
+    
     async def derecho_peticion_trigger(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Trigger /documento for 'derecho de peticion' queries."""
         await update.message.reply_text(
@@ -581,40 +1156,35 @@ Escribe tu pregunta o envía un audio 🎤
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Handle incoming text messages."""
-        user_query = update.message.text
         user = update.effective_user
         user_id = user.id
-        logger.info(f"Query from user {user_id}: {user_query}")
         
-        # Rate limit check
+        # Rate limit check first: rejected messages skip logging and analytics
         is_allowed, remaining = await self._check_rate_limit(user_id)
         if not is_allowed:
             await self._send_rate_limit_message(update)
             return
         
+        user_query = update.message.text
+        logger.info("Query from user %s: %s", user_id, user_query)
         analytics.track_query(user.id, user.username, user.first_name, 'text', user_query)
         await self._send_remaining_warning(update, remaining)
         
-        await update.message.chat.send_action(ChatAction.TYPING)
-        
         try:
-            # Retrieve relevant context from RAG
-            rag_context = self.rag.get_context_for_query(user_query, n_results=5)
-            
-            # Generate response
-            response = self._generate_response(user_query, rag_context)
+            # Retrieve relevant context from RAG (or reuse a semantically
+            # equivalent query) while the typing indicator is sent
+            _, entry = await asyncio.gather(
+                update.message.chat.send_action(ChatAction.TYPING),
+                self._get_answer_entry(user_query)
+            )
             
-            # Send response (handle markdown errors gracefully)
-            try:
-                await update.message.reply_text(response, parse_mode=ParseMode.MARKDOWN)
-            except Exception:
-                # Fallback to plain text if markdown fails
-                await update.message.reply_text(response)
+            # Generate and send the response, streaming it into the reply
+            await self._reply_text_answer(update, user_query, entry)
             
-            logger.info(f"Sent response to user {user_id}")
+            logger.info("Sent response to user %s", user_id)
             
         except Exception as e:
-            logger.error(f"Error handling message: {e}")
+            logger.error("Error handling message: %s", e)
             await update.message.reply_text(
                 "Lo siento, hubo un error procesando tu pregunta. Por favor intenta de nuevo más tarde."
             )
@@ -623,20 +1193,11 @@ Escribe tu pregunta o envía un audio 🎤
     
     async def documento_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Start document generation - /documento command."""
-        keyboard = [
-            [InlineKeyboardButton("📅 Prescripción (multa > 3 años)", callback_data="doc_prescripcion")],
-            [InlineKeyboardButton("📬 Sin notificación oportuna", callback_data="doc_fotomulta_notificacion")],
-            [InlineKeyboardButton("👤 No identifican al conductor", callback_data="doc_fotomulta_identificacion")],
-            [InlineKeyboardButton("🚫 Sin señalización (500m)", callback_data="doc_fotomulta_señalizacion")],
-            [InlineKeyboardButton("❌ Cancelar", callback_data="doc_cancel")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
         await update.message.reply_text(
             "📄 *GENERAR DERECHO DE PETICIÓN*\n\n"
             "Selecciona el tipo de documento que necesitas:\n\n"
             "_Cada tipo está fundamentado en la normativa colombiana vigente._",
-            reply_markup=reply_markup,
+            reply_markup=TEMPLATE_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN
         )
         return SELECTING_TEMPLATE
@@ -651,135 +1212,44 @@ Escribe tu pregunta o envía un audio 🎤
             return ConversationHandler.END
         
         template_type = query.data.replace("doc_", "")
-        user_id = update.effective_user.id
-        self.user_data[user_id] = {"template": template_type}
-        
-        templates_names = {
-            "prescripcion": "Prescripción de multa (Art. 159 Ley 769)",
-            "fotomulta_notificacion": "Nulidad por falta de notificación (Art. 8 Ley 1843)",
-            "fotomulta_identificacion": "Nulidad por no identificar conductor (C-038/2020)",
-            "fotomulta_señalizacion": "Nulidad por falta de señalización (Art. 5 Ley 1843)"
-        }
+        context.user_data.clear()
+        context.user_data["template"] = template_type
         
         await query.edit_message_text(
-            f"✅ Tipo: *{templates_names.get(template_type, template_type)}*\n\n"
-            "Ahora necesito tus datos. Escribe tu *nombre completo*:",
+            f"✅ Tipo: *{TEMPLATE_NAMES.get(template_type, template_type)}*\n\n"
+            "Ahora necesito tus datos. Escribe tu *nombre completo*:\n\n"
+            "_O envíalos todos en un solo mensaje, uno por línea: nombre, cédula, "
+            "dirección, teléfono, email, ciudad, comparendo, fecha y placa._",
             parse_mode=ParseMode.MARKDOWN
         )
         return NOMBRE
     
-    async def get_nombre(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["nombre"] = update.message.text
-        await update.message.reply_text(
-            "📝 Escribe tu *número de cédula*:",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return CEDULA
-    
-    async def get_cedula(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["cedula"] = update.message.text
-        await update.message.reply_text(
-            "🏠 Escribe tu *dirección completa* (para notificaciones):",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return DIRECCION
-    
-    async def get_direccion(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["direccion"] = update.message.text
-        await update.message.reply_text(
-            "📱 Escribe tu *número de teléfono*:",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return TELEFONO
-    
-    async def get_telefono(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["telefono"] = update.message.text
-        await update.message.reply_text(
-            "📧 Escribe tu *correo electrónico*:",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return EMAIL
-    
-    async def get_email(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["email"] = update.message.text
-        await update.message.reply_text(
-            "🏙️ ¿En qué *ciudad* está la autoridad de tránsito?\n"
-            "_Ejemplo: Bogotá D.C., Medellín, Cali_",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return CIUDAD
-    
-    async def get_ciudad(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["ciudad"] = update.message.text
-        await update.message.reply_text(
-            "🔢 Escribe el *número del comparendo/multa*:",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return COMPARENDO
-    
-    async def get_comparendo(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["comparendo"] = update.message.text
-        await update.message.reply_text(
-            "📅 ¿Cuál fue la *fecha de la infracción*?\n"
-            "_Ejemplo: 15 de enero de 2022_",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return FECHA
-    
-    async def get_fecha(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["fecha"] = update.message.text
-        await update.message.reply_text(
-            "🚗 Escribe la *placa del vehículo*:",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return PLACA
-    
-    async def get_placa(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
-        self.user_data[user_id]["placa"] = update.message.text
-        await update.message.reply_text(
-            "📝 Describe brevemente los *hechos adicionales* de tu caso.\n\n"
-            "_Ejemplo: 'Nunca recibí notificación', 'La cámara no tenía señalización'_\n\n"
-            "Escribe /saltar si no tienes hechos adicionales.",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        return HECHOS
+    async def collect_field(self, update: Update, context: ContextTypes.DEFAULT_TYPE, state: int) -> int:
+        """
+        Store the answer for one DOCUMENT_FIELDS step (see store_answer) and
+        prompt for the next, or re-ask the step if a field failed validation.
+        """
+        answered, invalid = store_answer(context.user_data, state, update.message.text)
+        if invalid is not None:
+            await update.message.reply_text(
+                INVALID_FIELD_MESSAGE.format(field=DOCUMENT_FIELDS[invalid][0]),
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return state
+        
+        _, next_prompt, next_state = DOCUMENT_FIELDS[answered]
+        await update.message.reply_text(next_prompt, parse_mode=ParseMode.MARKDOWN)
+        return next_state
     
     async def get_hechos(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-        user_id = update.effective_user.id
         text = update.message.text
-        self.user_data[user_id]["hechos"] = "" if text == "/saltar" else text
+        context.user_data["hechos"] = "" if text == "/saltar" else text
         
-        data = self.user_data[user_id]
-        resumen = f"""📄 *RESUMEN DE TU DOCUMENTO*
-
-👤 Nombre: {data['nombre']}
-🆔 Cédula: {data['cedula']}
-🏠 Dirección: {data['direccion']}
-📱 Teléfono: {data['telefono']}
-📧 Email: {data['email']}
-🏙️ Ciudad autoridad: {data['ciudad']}
-🔢 Comparendo: {data['comparendo']}
-📅 Fecha infracción: {data['fecha']}
-🚗 Placa: {data['placa']}
-
-¿Generar el documento PDF?"""
+        resumen = DOCUMENT_SUMMARY_TEMPLATE.format_map(context.user_data)
         
-        keyboard = [
-            [InlineKeyboardButton("✅ Generar PDF", callback_data="doc_generar")],
-            [InlineKeyboardButton("❌ Cancelar", callback_data="doc_cancel_final")]
-        ]
         await update.message.reply_text(
             resumen, 
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=CONFIRM_KEYBOARD,
             parse_mode=ParseMode.MARKDOWN
         )
         return CONFIRMAR
@@ -790,14 +1260,12 @@ Escribe tu pregunta o envía un audio 🎤
         await query.answer()
         
         if query.data == "doc_cancel_final":
-            user_id = update.effective_user.id
-            if user_id in self.user_data:
-                del self.user_data[user_id]
+            context.user_data.clear()
             await query.edit_message_text("❌ Generación cancelada.")
             return ConversationHandler.END
         
         user_id = update.effective_user.id
-        data = self.user_data.get(user_id, {})
+        data = context.user_data
         
         # Track document generation
         analytics.track_query(
@@ -811,7 +1279,9 @@ Escribe tu pregunta o envía un audio 🎤
         await query.edit_message_text("⏳ Generando tu documento PDF...")
         
         try:
-            pdf_buffer = self.doc_generator.generate_document(
+            # ReportLab rendering is CPU-bound; run it in a worker process
+            pdf_bytes = await self._run_rendering(
+                render_document,
                 template_type=data['template'],
                 nombre_completo=data['nombre'],
                 cedula=data['cedula'],
@@ -829,48 +1299,104 @@ Escribe tu pregunta o envía un audio 🎤
             
             await context.bot.send_document(
                 chat_id=update.effective_chat.id,
-                document=pdf_buffer,
+                document=pdf_bytes,
                 filename=filename,
-                caption="📄 *¡Tu Derecho de Petición está listo!*\n\n"
-                        "✅ Imprímelo y fírmalo\n"
-                        "✅ Radícalo en la Secretaría de Tránsito\n"
-                        "✅ Guarda copia con sello de radicado\n"
-                        "✅ Tienen 15 días hábiles para responder\n\n"
-                        "_Documento generado con fundamentos de la normativa colombiana vigente._",
+                caption=DOCUMENT_READY_CAPTION,
                 parse_mode=ParseMode.MARKDOWN
             )
             
-            logger.info(f"Generated document for user {user_id}: {filename}")
+            logger.info("Generated document for user %s: %s", user_id, filename)
             
         except Exception as e:
-            logger.error(f"Error generating document: {e}")
+            logger.error("Error generating document: %s", e)
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
                 text="❌ Error generando el documento. Por favor intenta de nuevo."
             )
         
-        # Clean up
-        if user_id in self.user_data:
-            del self.user_data[user_id]
+        context.user_data.clear()
         
         return ConversationHandler.END
     
     async def cancel_documento(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Cancel document generation."""
-        user_id = update.effective_user.id
-        if user_id in self.user_data:
-            del self.user_data[user_id]
+        context.user_data.clear()
         await update.message.reply_text("❌ Generación de documento cancelada.")
         return ConversationHandler.END
     
+    async def documento_timeout(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Drop the partial document data of an abandoned conversation."""
+        context.user_data.clear()
+    
     # ==================== BOT RUNNER ====================
     
+    def _answer_cache_metadata(self) -> dict:
+        """What a persisted answer cache must match to be reused."""
+        return {
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_dimensions": EMBEDDING_DIMENSIONS,
+            "llm_model": self.llm_model,
+            "llm_simple_model": self.llm_simple_model,
+            "llm_voice_model": self.llm_voice_model,
+            "index_version": self.rag.index_version(),
+        }
+    
+    async def _post_init(self, application: Application) -> None:
+        """
+        Restore the answer cache, then pre-warm the OpenAI connection and the
+        TTS cache once the application is built.
+        """
+        loaded = await self._run_blocking(
+            self.answer_cache.load, SEMANTIC_CACHE_PATH, self._answer_cache_metadata()
+        )
+        logger.info("Restored %d cached answers from %s", loaded, SEMANTIC_CACHE_PATH)
+        application.create_task(self._prewarm_connections())
+        application.create_task(self._prewarm_tts_cache())
+    
+    async def _post_shutdown(self, application: Application) -> None:
+        """
+        Persist the answer cache, drain pending embeddings, and close the
+        pooled OpenAI connections and the thread pools.
+        """
+        try:
+            await self._run_blocking(
+                self.answer_cache.save, SEMANTIC_CACHE_PATH, self._answer_cache_metadata()
+            )
+        except Exception as e:
+            logger.warning("Could not save answer cache: %s", e)
+        await self.embedder.close()
+        await close_async_openai_client()
+        self.executor.shutdown(wait=False)
+        self.rag_executor.shutdown(wait=False)
+        self.pdf_executor.shutdown(wait=False)
+    
     def run(self) -> None:
         """Run the bot."""
         logger.info("Starting TransitoColBot...")
         
         # Create application
-        self.application = Application.builder().token(self.telegram_token).build()
+        self.application = (
+            Application.builder()
+            .token(self.telegram_token)
+            .request(HTTPXRequest(
+                connection_pool_size=TELEGRAM_POOL_SIZE,
+                connect_timeout=5.0,
+                read_timeout=30.0,
+                pool_timeout=None,  # wait for a connection under spikes instead of failing
+                http_version="2"
+            ))
+            .get_updates_request(HTTPXRequest(
+                connection_pool_size=TELEGRAM_UPDATES_POOL_SIZE,
+                http_version="2"
+            ))
+            # Keeps replies under Telegram's flood limits and retries after a
+            # RetryAfter (FloodWait) instead of dropping the message
+            .rate_limiter(AIORateLimiter(max_retries=TELEGRAM_FLOOD_RETRIES))
+            .concurrent_updates(ChatSerialUpdateProcessor(CONCURRENT_UPDATES))
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
         
         # Command handlers
         self.application.add_handler(CommandHandler("start", self.start_command))
@@ -884,39 +1410,46 @@ Escribe tu pregunta o envía un audio 🎤
             entry_points=[CommandHandler("documento", self.documento_command)],
             states={
                 SELECTING_TEMPLATE: [CallbackQueryHandler(self.template_selected)],
-                NOMBRE: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_nombre)],
-                CEDULA: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_cedula)],
-                DIRECCION: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_direccion)],
-                TELEFONO: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_telefono)],
-                EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_email)],
-                CIUDAD: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_ciudad)],
-                COMPARENDO: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_comparendo)],
-                FECHA: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_fecha)],
-                PLACA: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_placa)],
+                **{
+                    state: [MessageHandler(
+                        filters.TEXT & ~filters.COMMAND,
+                        functools.partial(self.collect_field, state=state)
+                    )]
+                    for state in DOCUMENT_FIELDS
+                },
                 HECHOS: [
                     MessageHandler(filters.TEXT & ~filters.COMMAND, self.get_hechos),
                     CommandHandler("saltar", self.get_hechos)
                 ],
                 CONFIRMAR: [CallbackQueryHandler(self.generar_documento)],
+                ConversationHandler.TIMEOUT: [TypeHandler(Update, self.documento_timeout)],
             },
             fallbacks=[CommandHandler("cancelar", self.cancel_documento)],
+            conversation_timeout=DOCUMENT_CONVERSATION_TIMEOUT,
         )
         self.application.add_handler(doc_conv_handler)
         
         # Message handlers (order matters!)
-        # Regex handles both accented (ó) and non-accented (o) versions of "petición"
         self.application.add_handler(
-            MessageHandler(
-                filters.Regex(r'(?i)(derecho.*petici[oó]n|crear.*(derecho.*petici[oó]n|documento)|petici[oó]n.*derecho)'),
-                self.derecho_peticion_trigger
-            )
+            MessageHandler(filters.Regex(DERECHO_PETICION_PATTERN), self.derecho_peticion_trigger)
         )
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
         self.application.add_handler(MessageHandler(filters.VOICE, self.handle_voice))
         
-        # Start polling
         logger.info("Bot is running. Press Ctrl+C to stop.")
-        self.application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if WEBHOOK_URL:
+            url_path = urlparse(WEBHOOK_URL).path.lstrip("/")
+            self.application.run_webhook(
+                listen="0.0.0.0",
+                port=WEBHOOK_PORT,
+                url_path=url_path,
+                webhook_url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=ALLOWED_UPDATES
+            )
+        else:
+            self.application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 def create_bot(rag_pipeline: RAGPipeline) -> TransitoBot:
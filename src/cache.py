@@ -0,0 +1,253 @@
+"""
+Semantic answer cache for the Telegram bot
+Near-duplicate questions ("multa por cinturón" / "multa del cinturón") reuse
+the retrieved context and generated answers instead of repeating the vector
+search and the LLM call; synthesized speech is kept on disk across restarts
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Approximate nearest-neighbour cache over unit-length query embeddings.
+    
+    Candidates are found with random-projection LSH (n_tables tables of
+    n_planes hyperplanes each) and confirmed with an exact cosine check
+    against the threshold. With 12 planes x 8 tables a query at cosine 0.95
+    shares a bucket with its match in at least one table ~93% of the time.
+    Least recently used entries are evicted beyond maxsize.
+    """
+    
+    def __init__(
+        self,
+        dim: int,
+        threshold: float = 0.95,
+        maxsize: int = 2048,
+        n_planes: int = 12,
+        n_tables: int = 8,
+        seed: int = 0
+    ):
+        self.dim = dim
+        self.threshold = threshold
+        self.maxsize = maxsize
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_tables, n_planes, dim)).astype(np.float32)
+        self._bit_weights = 1 << np.arange(n_planes, dtype=np.int64)
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(n_tables)]
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (embedding, signatures, value)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _signatures(self, embedding: np.ndarray) -> List[int]:
+        """One bucket key per table: the sign pattern of the projections."""
+        bits = (self._planes @ embedding) > 0  # (n_tables, n_planes)
+        return (bits @ self._bit_weights).tolist()
+    
+    def get(self, embedding: np.ndarray) -> Optional[Any]:
+        """Return the value of the most similar cached query, if similar enough."""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        signatures = self._signatures(embedding)
+        with self._lock:
+            candidates = set()
+            for table, signature in zip(self._buckets, signatures):
+                candidates |= table.get(signature, set())
+            
+            best_id, best_score = None, self.threshold
+            for entry_id in candidates:
+                score = float(self._entries[entry_id][0] @ embedding)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return self._entries[best_id][2]
+    
+    def put(self, embedding: np.ndarray, value: Any):
+        """Cache a value under a query embedding."""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        signatures = self._signatures(embedding)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (embedding, signatures, value)
+            for table, signature in zip(self._buckets, signatures):
+                table.setdefault(signature, set()).add(entry_id)
+            
+            while len(self._entries) > self.maxsize:
+                self._evict_oldest()
+    
+    def _evict_oldest(self):
+        entry_id, (_, signatures, _) = self._entries.popitem(last=False)
+        for table, signature in zip(self._buckets, signatures):
+            bucket = table.get(signature)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[signature]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for table in self._buckets:
+                table.clear()
+    
+    def save(self, path: str, metadata: Dict[str, Any]):
+        """
+        Write the entries (least recently used first) to an .npz file: the
+        embeddings as a float32 matrix plus the JSON-serializable values and
+        metadata describing what produced them (see load).
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+        embeddings = (
+            np.stack([embedding for embedding, _, _ in entries])
+            if entries else np.empty((0, self.dim), dtype=np.float32)
+        )
+        payload = json.dumps({"metadata": metadata, "values": [value for _, _, value in entries]})
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, embeddings=embeddings, payload=np.array(payload))
+        os.replace(tmp_path, path)
+    
+    def load(self, path: str, metadata: Dict[str, Any]) -> int:
+        """
+        Load entries saved with save(). Nothing is loaded if the file is
+        missing, unreadable, or was saved with different metadata (another
+        embedding model, LLM or index). Returns the number of entries loaded.
+        """
+        try:
+            with np.load(path) as data:
+                embeddings = data["embeddings"]
+                payload = json.loads(str(data["payload"]))
+        except (OSError, KeyError, ValueError):
+            return 0
+        if payload.get("metadata") != metadata or embeddings.shape[1:] != (self.dim,):
+            return 0
+        for embedding, value in zip(embeddings, payload["values"]):
+            self.put(embedding, value)
+        return len(payload["values"])
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping for exact-key caches."""
+    
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+    
+    def put(self, key: Any, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class FileCache:
+    """
+    Content-addressed byte cache on disk (one file per key).
+    
+    Keys are hashed with BLAKE2b, so any string works as a key. Writes go
+    through a temp file and os.replace, so readers never see partial files.
+    With max_bytes set, the least recently used files (by mtime, refreshed on
+    every hit) are deleted once the cache outgrows it, down to 90% of the cap.
+    """
+    
+    def __init__(self, directory: str, suffix: str = "", max_bytes: Optional[int] = None):
+        self.directory = Path(directory)
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(entry.stat().st_size for entry in self._files())
+    
+    def _path(self, key: str) -> Path:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return self.directory / f"{digest}{self.suffix}"
+    
+    def _files(self) -> List[os.DirEntry]:
+        return [
+            entry for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith(self.suffix) and not entry.name.endswith(".tmp")
+        ]
+    
+    def __contains__(self, key: str) -> bool:
+        return self._path(key).exists()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        if self.max_bytes is not None:
+            try:
+                os.utime(path)  # mark as recently used
+            except FileNotFoundError:
+                pass
+        return data
+    
+    def put(self, key: str, value: bytes):
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self._size += len(value) - replaced
+            over = self.max_bytes is not None and self._size > self.max_bytes
+        if over:
+            self.prune()
+    
+    def prune(self):
+        """Delete least recently used files until the cache is under 90% of max_bytes."""
+        with self._lock:
+            files = sorted(self._files(), key=lambda entry: entry.stat().st_mtime)
+            size = sum(entry.stat().st_size for entry in files)
+            target = self.max_bytes * 0.9
+            for entry in files:
+                if size <= target:
+                    break
+                try:
+                    file_size = entry.stat().st_size
+                    os.unlink(entry.path)
+                    size -= file_size
+                except FileNotFoundError:
+                    pass
+            self._size = size
@@ -0,0 +1,68 @@
+"""
+Shared OpenAI clients on pooled HTTP/2 connections
+One instance per process, so ingest batches, RAG queries and bot requests
+reuse warm TCP+TLS sessions instead of handshaking per call
+"""
+import os
+import threading
+from typing import Optional
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+# Connection pool for the sync client (ingest batches, RAG query embeddings)
+HTTP_LIMITS = httpx.Limits(
+    max_keepalive_connections=16,
+    max_connections=32,
+    keepalive_expiry=60.0
+)
+HTTP_TIMEOUT = httpx.Timeout(60.0)
+
+# The bot's async client serves many users at once (chat, Whisper and TTS per
+# voice query), so it gets a wider pool and fails fast on connect
+ASYNC_HTTP_LIMITS = httpx.Limits(
+    max_keepalive_connections=32,
+    max_connections=64,
+    keepalive_expiry=60.0
+)
+ASYNC_HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+_lock = threading.Lock()
+_openai_client: Optional[OpenAI] = None
+_async_openai_client: Optional[AsyncOpenAI] = None
+
+
+def get_openai_client() -> OpenAI:
+    """Get the process-wide synchronous OpenAI client."""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+                )
+    return _openai_client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Get the process-wide async OpenAI client."""
+    global _async_openai_client
+    if _async_openai_client is None:
+        with _lock:
+            if _async_openai_client is None:
+                _async_openai_client = AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=httpx.AsyncClient(
+                        http2=True, limits=ASYNC_HTTP_LIMITS, timeout=ASYNC_HTTP_TIMEOUT
+                    )
+                )
+    return _async_openai_client
+
+
+async def close_async_openai_client():
+    """Close the async client's connections (call on shutdown)."""
+    global _async_openai_client
+    if _async_openai_client is not None:
+        await _async_openai_client.close()
+        _async_openai_client = None
@@ -0,0 +1,45 @@
+"""
+Prompt context compaction
+Deterministic shrinking of retrieved chunks before they go into the prompt.
+Kept free of the vector-store imports so it can be used and tested alone
+"""
+import re
+from typing import Iterable, List
+
+# Lines dropped from retrieved chunks, and the minimum length of a sentence
+# before repeats of it are dropped
+CONTEXT_BOILERPLATE_PATTERNS = [
+    re.compile(r'[=\-_~*]{3,}'),  # separator rules
+    re.compile(r'[.;,]'),  # stray punctuation left by the source HTML
+]
+CONTEXT_SENTENCE_SPLIT = re.compile(r'(?<=[.;:])\s+')
+MIN_DEDUP_SENTENCE_CHARS = 40
+
+
+def compact_chunks(docs: Iterable[str]) -> List[str]:
+    """
+    Deterministically shrink retrieved chunks before they go into the prompt:
+    whitespace runs are collapsed, boilerplate lines dropped, and sentences
+    already seen in an earlier chunk (e.g. the "Norma Anterior" copy of an
+    amended article) removed. Chunks can come back empty.
+    """
+    seen = set()
+    compacted = []
+    for doc in docs:
+        lines = []
+        for line in doc.splitlines():
+            line = " ".join(line.split())
+            if not line or any(p.fullmatch(line) for p in CONTEXT_BOILERPLATE_PATTERNS):
+                continue
+            kept = []
+            for sentence in CONTEXT_SENTENCE_SPLIT.split(line):
+                if len(sentence) >= MIN_DEDUP_SENTENCE_CHARS:
+                    key = sentence.lower()
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                kept.append(sentence)
+            if kept:
+                lines.append(" ".join(kept))
+        compacted.append("\n".join(lines))
+    return compacted
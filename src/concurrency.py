@@ -0,0 +1,92 @@
+"""
+asyncio coordination helpers for the bot's concurrent update handling
+Kept free of telegram imports so they can be tested on their own
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class InFlight:
+    """
+    Shares one in-progress call among concurrent callers with the same key:
+    the first caller runs it and the others wait for its result.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._pending
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Tuple[bool, Any]:
+        """
+        Await call(), or the result of the call already running for key.
+        Returns (led, result), where led is False for callers that only
+        waited. If the call fails or is cancelled, waiters get None and the
+        error reaches only the caller that ran it. Cancelling a waiter
+        leaves the call running for everyone else.
+        """
+        pending = self._pending.get(key)
+        if pending is not None:
+            return False, await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        result = None
+        try:
+            result = await call()
+            return True, result
+        finally:
+            del self._pending[key]
+            future.set_result(result)
+
+
+class KeyedLocks:
+    """
+    One asyncio.Lock per key, created on first use and dropped once no task
+    holds or waits for it, so memory follows the number of busy keys.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}  # key -> (lock, users)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """Hold key's lock; tasks for the same key run one at a time, in arrival order."""
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+class ChatSerialProcessing:
+    """
+    do_process_update for a PTB update processor: updates from different
+    chats run concurrently but those of one chat in arrival order. Updates
+    without a chat are not serialized.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._chats = KeyedLocks()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = getattr(update, "effective_chat", None)
+        if chat is None:
+            await coroutine
+            return
+        async with self._chats.hold(chat.id):
+            await coroutine
@@ -0,0 +1,158 @@
+"""
+Request dispatchers for the OpenAI API
+Chat completion streams from concurrent handlers share a concurrency bound,
+and query embeddings requested within a short window are merged into one
+list-input request. Rate-limited (429) calls are retried honouring the
+Retry-After header
+"""
+import asyncio
+import logging
+import random
+from typing import Any, AsyncIterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 32
+# Upper bound on in-flight completions against the API key
+MAX_CONCURRENCY = 32
+# Embedding requests take list inputs, so a longer window is worth waiting for
+EMBEDDING_WINDOW = 0.05
+MAX_RETRIES = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 20.0
+
+
+def _retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying a failed call, or None if it should not
+    be retried. Only rate limits (HTTP 429) are retried.
+    """
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return min(float(retry_after), RETRY_MAX_DELAY)
+    except (TypeError, ValueError):
+        # Exponential backoff with jitter when the server gives no hint
+        return min(RETRY_BASE_DELAY * 2 ** attempt, RETRY_MAX_DELAY) * (0.5 + random.random() / 2)
+
+
+async def _with_retries(call, **kwargs) -> Any:
+    """Await call(**kwargs), retrying rate-limited requests."""
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return await call(**kwargs)
+        except Exception as e:
+            delay = _retry_delay(e, attempt)
+            if delay is None or attempt == MAX_RETRIES:
+                raise
+            logger.warning("Rate limited, retrying in %.1fs (attempt %d)", delay, attempt + 1)
+            await asyncio.sleep(delay)
+
+
+class RequestDispatcher:
+    """
+    Front end for streamed chat.completions.create calls: at most
+    max_concurrency streams are open against the API key at once, and
+    rate-limited calls are retried.
+    """
+
+    def __init__(self, client, max_concurrency: int = MAX_CONCURRENCY):
+        self.client = client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def stream(self, **kwargs) -> AsyncIterator[Any]:
+        """Stream a chat completion's chunks under the concurrency bound."""
+        async with self._semaphore:
+            stream = await _with_retries(self.client.chat.completions.create, stream=True, **kwargs)
+            async for chunk in stream:
+                yield chunk
+
+
+class EmbeddingBatcher:
+    """
+    Merges query embeddings requested within EMBEDDING_WINDOW into a single
+    embeddings.create call with a list input (same tokens, one request
+    against the RPM limit). embed() returns the raw embedding of one text.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        dimensions: Optional[int] = None,
+        window: float = EMBEDDING_WINDOW,
+        max_batch: int = MAX_BATCH_SIZE
+    ):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue a text and wait for its embedding."""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def close(self) -> None:
+        """Stop the background worker and wait for in-flight batches."""
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                future.cancel()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    def _ensure_worker(self) -> None:
+        """Start the coalescing task on the running loop (first embed)."""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        """Collect texts into windows of up to max_batch / window seconds."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Don't block the next window on this one's round-trips
+            task = loop.create_task(self._dispatch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Embed one window of texts in a single request and resolve their futures."""
+        logger.debug("Embedding %d coalesced quer(ies)", len(batch))
+        kwargs = {"model": self.model, "input": [text for text, _ in batch]}
+        if self.dimensions:
+            kwargs["dimensions"] = self.dimensions
+        try:
+            response = await _with_retries(self.client.embeddings.create, **kwargs)
+            embeddings = [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        except Exception as e:
+            embeddings = [e] * len(batch)
+        for (_, future), embedding in zip(batch, embeddings):
+            if future.done():  # caller went away
+                continue
+            if isinstance(embedding, BaseException):
+                future.set_exception(embedding)
+            else:
+                future.set_result(embedding)
@@ -0,0 +1,95 @@
+"""
+/documento data collection
+The free-text trigger, conversation states, the per-field steps and
+validation of the answers. Kept free of telegram imports; the bot's handlers
+call store_answer
+"""
+import re
+from typing import MutableMapping, Optional, Tuple
+
+from .document_generator import MESES
+
+# Messages asking for a derecho de petición start the /documento flow:
+# "derecho(s) ... petición", "petición ... derecho" or "crear ... documento"
+# with at most three words in between, accented (ó) or not. Bounded gaps
+# instead of ".*" keep matching linear on long messages
+DERECHO_PETICION_PATTERN = re.compile(
+    r'(?i)\b(?:derechos?\W+(?:\w+\W+){0,3}?petici[oó]n'
+    r'|petici[oó]n\W+(?:\w+\W+){0,3}?derechos?'
+    r'|crear\W+(?:\w+\W+){0,3}?documento)\b'
+)
+
+# Conversation states for document generation
+(SELECTING_TEMPLATE, NOMBRE, CEDULA, DIRECCION, TELEFONO, EMAIL,
+ CIUDAD, COMPARENDO, FECHA, PLACA, HECHOS, CONFIRMAR) = range(12)
+
+# Data-collection steps: state -> (field stored, prompt for the next field, next state)
+DOCUMENT_FIELDS = {
+    NOMBRE: ("nombre", "📝 Escribe tu *número de cédula*:", CEDULA),
+    CEDULA: ("cedula", "🏠 Escribe tu *dirección completa* (para notificaciones):", DIRECCION),
+    DIRECCION: ("direccion", "📱 Escribe tu *número de teléfono*:", TELEFONO),
+    TELEFONO: ("telefono", "📧 Escribe tu *correo electrónico*:", EMAIL),
+    EMAIL: (
+        "email",
+        "🏙️ ¿En qué *ciudad* está la autoridad de tránsito?\n"
+        "_Ejemplo: Bogotá D.C., Medellín, Cali_",
+        CIUDAD
+    ),
+    CIUDAD: ("ciudad", "🔢 Escribe el *número del comparendo/multa*:", COMPARENDO),
+    COMPARENDO: (
+        "comparendo",
+        "📅 ¿Cuál fue la *fecha de la infracción*?\n"
+        "_Ejemplo: 15 de enero de 2022_",
+        FECHA
+    ),
+    FECHA: ("fecha", "🚗 Escribe la *placa del vehículo*:", PLACA),
+    PLACA: (
+        "placa",
+        "📝 Describe brevemente los *hechos adicionales* de tu caso.\n\n"
+        "_Ejemplo: 'Nunca recibí notificación', 'La cámara no tenía señalización'_\n\n"
+        "Escribe /saltar si no tienes hechos adicionales.",
+        HECHOS
+    ),
+}
+
+# Cheap format checks for the fields that have one; a bad answer is re-asked
+# right away instead of surfacing in the PDF after the whole flow. Dates may
+# be written out as the prompt suggests ("15 de enero de 2022") or numeric
+FIELD_PATTERNS = {
+    CEDULA: re.compile(r'^\d[\d.\s]{4,14}$'),
+    TELEFONO: re.compile(r'^\+?[\d\s()-]{7,20}$'),
+    EMAIL: re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$'),
+    FECHA: re.compile(
+        r'^(?:\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{1,2}-\d{1,2}'
+        r'|\d{1,2}\s+(?:de\s+)?(?:' + "|".join(MESES) + r')\s+(?:del?\s+)?\d{4})$',
+        re.IGNORECASE
+    ),
+    PLACA: re.compile(r'^[A-Z]{3}[-\s]?\d{2}[\dA-Z]$', re.IGNORECASE),
+}
+INVALID_FIELD_MESSAGE = "⚠️ Formato inválido para *{field}*, inténtalo de nuevo:"
+
+
+def store_answer(user_data: MutableMapping, state: int, text: str) -> Tuple[int, Optional[int]]:
+    """
+    Validate the answer to a DOCUMENT_FIELDS step and store it in user_data.
+    At the first step, a message with one line per field fills them all.
+    Returns (answered, invalid): the step whose follow-up prompt comes next,
+    and the state of a field that failed validation (None if all passed;
+    nothing is stored then).
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()] if state == NOMBRE else []
+    if len(lines) == len(DOCUMENT_FIELDS):
+        for field_state, value in zip(DOCUMENT_FIELDS, lines):
+            pattern = FIELD_PATTERNS.get(field_state)
+            if pattern and not pattern.match(value):
+                return state, field_state
+        for (key, _, _), value in zip(DOCUMENT_FIELDS.values(), lines):
+            user_data[key] = value
+        return PLACA, None  # continue as if the last field was just answered
+    
+    text = text.strip()
+    pattern = FIELD_PATTERNS.get(state)
+    if pattern and not pattern.match(text):
+        return state, state
+    user_data[DOCUMENT_FIELDS[state][0]] = text
+    return state, None
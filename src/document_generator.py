@@ -3,6 +3,7 @@ Derecho de Petición Generator for Colombian Traffic Fines
 Generates PDF documents based on user case information
 """
 import os
+import copy
 from datetime import datetime
 from io import BytesIO
 from reportlab.lib.pagesizes import letter
@@ -12,6 +13,55 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER, TA_RIGHT
 
 
+# Month names for the document date, independent of the system locale
+MESES = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+)
+
+
+def format_fecha(fecha: datetime) -> str:
+    """Format a date in Spanish, e.g. '05 de marzo de 2024'."""
+    return f"{fecha.day:02d} de {MESES[fecha.month - 1]} de {fecha.year}"
+
+
+def _split_paragraphs(text: str) -> list:
+    """Split a template text block into stripped, non-empty paragraphs."""
+    return [para.strip() for para in text.strip().split('\n\n') if para.strip()]
+
+
+def _build_styles():
+    """Sample style sheet plus the custom paragraph styles used by the documents."""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='Justified',
+        parent=styles['Normal'],
+        alignment=TA_JUSTIFY,
+        fontSize=11,
+        leading=14,
+        spaceAfter=12
+    ))
+    styles.add(ParagraphStyle(
+        name='Header',
+        parent=styles['Heading1'],
+        alignment=TA_CENTER,
+        fontSize=14,
+        spaceAfter=20
+    ))
+    styles.add(ParagraphStyle(
+        name='RightAlign',
+        parent=styles['Normal'],
+        alignment=TA_RIGHT,
+        fontSize=11
+    ))
+    return styles
+
+
+# Styles are never modified after setup, so every generator (and every PDF
+# worker process) shares one sheet built at import time
+_STYLES = _build_styles()
+
+
 class DerechoPeticionGenerator:
     """Generate Derecho de Petición PDF documents."""
     
@@ -137,33 +187,43 @@ CUARTO: Archivar definitivamente el presente proceso.
         }
     }
     
-    def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_styles()
+    # Template types with descriptions
+    AVAILABLE_TEMPLATES = {
+        "prescripcion": "Multa con más de 3 años de antigüedad (prescripción)",
+        "fotomulta_notificacion": "Fotomulta sin notificación oportuna (más de 3 días)",
+        "fotomulta_identificacion": "Fotomulta donde no se identifica al conductor",
+        "fotomulta_señalizacion": "Fotomulta sin señalización adecuada (500m antes)"
+    }
     
-    def _setup_styles(self):
-        """Configure custom paragraph styles."""
-        self.styles.add(ParagraphStyle(
-            name='Justified',
-            parent=self.styles['Normal'],
-            alignment=TA_JUSTIFY,
-            fontSize=11,
-            leading=14,
-            spaceAfter=12
-        ))
-        self.styles.add(ParagraphStyle(
-            name='Header',
-            parent=self.styles['Heading1'],
-            alignment=TA_CENTER,
-            fontSize=14,
-            spaceAfter=20
-        ))
-        self.styles.add(ParagraphStyle(
-            name='RightAlign',
-            parent=self.styles['Normal'],
-            alignment=TA_RIGHT,
-            fontSize=11
-        ))
+    def __init__(self):
+        self.styles = _STYLES
+        # The template texts and headings are constant, so their markup is
+        # parsed into Paragraph prototypes once; each document gets shallow
+        # copies, leaving the prototypes untouched by layout
+        justified = self.styles['Justified']
+        self._paragraphs = {
+            template_type: (
+                [Paragraph(para, justified) for para in _split_paragraphs(template['legal_basis'])],
+                [Paragraph(para, justified) for para in _split_paragraphs(template['request'])]
+            )
+            for template_type, template in self.TEMPLATES.items()
+        }
+        normal = self.styles['Normal']
+        self._static = {
+            "senores": Paragraph("Señores", normal),
+            "ciudad": Paragraph("Ciudad", normal),
+            "saludo": Paragraph("Respetados señores:", justified),
+            "hechos": Paragraph("<b>HECHOS:</b>", normal),
+            "fundamentos": Paragraph("<b>FUNDAMENTOS DE DERECHO:</b>", normal),
+            "notificaciones": Paragraph("<b>NOTIFICACIONES:</b>", normal),
+            "cierre": Paragraph(
+                "Agradezco su atención y quedo atento(a) a su respuesta dentro de "
+                "los términos de ley (15 días hábiles).",
+                justified
+            ),
+            "atentamente": Paragraph("Atentamente,", normal),
+            "firma": Paragraph("_" * 40, normal),
+        }
     
     def generate_document(
         self,
@@ -202,6 +262,13 @@ CUARTO: Archivar definitivamente el presente proceso.
             raise ValueError(f"Unknown template type: {template_type}")
         
         template = self.TEMPLATES[template_type]
+        legal_paras, request_paras = self._paragraphs[template_type]
+        normal = self.styles['Normal']
+        justified = self.styles['Justified']
+        
+        def static(name: str) -> Paragraph:
+            return copy.copy(self._static[name])
+        
         buffer = BytesIO()
         
         doc = SimpleDocTemplate(
@@ -214,32 +281,26 @@ CUARTO: Archivar definitivamente el presente proceso.
         )
         
         story = []
-        fecha_actual = datetime.now().strftime("%d de %B de %Y").replace(
-            "January", "enero").replace("February", "febrero").replace(
-            "March", "marzo").replace("April", "abril").replace(
-            "May", "mayo").replace("June", "junio").replace(
-            "July", "julio").replace("August", "agosto").replace(
-            "September", "septiembre").replace("October", "octubre").replace(
-            "November", "noviembre").replace("December", "diciembre")
+        fecha_actual = format_fecha(datetime.now())
         
         # Header with date and city
         story.append(Paragraph(f"{ciudad_autoridad}, {fecha_actual}", self.styles['RightAlign']))
         story.append(Spacer(1, 20))
         
         # Addressee
-        story.append(Paragraph("Señores", self.styles['Normal']))
-        story.append(Paragraph(f"<b>SECRETARÍA DE TRÁNSITO Y TRANSPORTE DE {ciudad_autoridad.upper()}</b>", self.styles['Normal']))
-        story.append(Paragraph("Ciudad", self.styles['Normal']))
+        story.append(static("senores"))
+        story.append(Paragraph(f"<b>SECRETARÍA DE TRÁNSITO Y TRANSPORTE DE {ciudad_autoridad.upper()}</b>", normal))
+        story.append(static("ciudad"))
         story.append(Spacer(1, 20))
         
         # Subject
-        story.append(Paragraph(f"<b>Asunto: {template['title']}</b>", self.styles['Normal']))
-        story.append(Paragraph(f"<b>Comparendo No.: {numero_comparendo}</b>", self.styles['Normal']))
-        story.append(Paragraph(f"<b>Placa: {placa_vehiculo}</b>", self.styles['Normal']))
+        story.append(Paragraph(f"<b>Asunto: {template['title']}</b>", normal))
+        story.append(Paragraph(f"<b>Comparendo No.: {numero_comparendo}</b>", normal))
+        story.append(Paragraph(f"<b>Placa: {placa_vehiculo}</b>", normal))
         story.append(Spacer(1, 20))
         
         # Greeting
-        story.append(Paragraph("Respetados señores:", self.styles['Justified']))
+        story.append(static("saludo"))
         story.append(Spacer(1, 10))
         
         # Introduction
@@ -250,32 +311,28 @@ CUARTO: Archivar definitivamente el presente proceso.
         solicitud relacionada con el comparendo número <b>{numero_comparendo}</b>, presuntamente impuesto 
         el día <b>{fecha_infraccion}</b> al vehículo de placas <b>{placa_vehiculo}</b>.
         """
-        story.append(Paragraph(intro, self.styles['Justified']))
+        story.append(Paragraph(intro, justified))
         story.append(Spacer(1, 15))
         
         # Facts section
-        story.append(Paragraph("<b>HECHOS:</b>", self.styles['Normal']))
+        story.append(static("hechos"))
         story.append(Spacer(1, 10))
         
         if hechos_adicionales:
-            story.append(Paragraph(hechos_adicionales, self.styles['Justified']))
+            story.append(Paragraph(hechos_adicionales, justified))
             story.append(Spacer(1, 10))
         
         # Legal basis
-        story.append(Paragraph("<b>FUNDAMENTOS DE DERECHO:</b>", self.styles['Normal']))
-        for para in template['legal_basis'].strip().split('\n\n'):
-            if para.strip():
-                story.append(Paragraph(para.strip(), self.styles['Justified']))
+        story.append(static("fundamentos"))
+        story.extend(map(copy.copy, legal_paras))
         story.append(Spacer(1, 15))
         
         # Request
-        for para in template['request'].strip().split('\n\n'):
-            if para.strip():
-                story.append(Paragraph(para.strip(), self.styles['Justified']))
+        story.extend(map(copy.copy, request_paras))
         story.append(Spacer(1, 15))
         
         # Notifications
-        story.append(Paragraph("<b>NOTIFICACIONES:</b>", self.styles['Normal']))
+        story.append(static("notificaciones"))
         story.append(Spacer(1, 5))
         notificaciones = f"""
         Recibiré notificaciones en:<br/>
@@ -283,19 +340,19 @@ CUARTO: Archivar definitivamente el presente proceso.
         <b>Teléfono:</b> {telefono}<br/>
         <b>Correo electrónico:</b> {email}
         """
-        story.append(Paragraph(notificaciones, self.styles['Justified']))
+        story.append(Paragraph(notificaciones, justified))
         story.append(Spacer(1, 20))
         
         # Closing
-        story.append(Paragraph("Agradezco su atención y quedo atento(a) a su respuesta dentro de los términos de ley (15 días hábiles).", self.styles['Justified']))
+        story.append(static("cierre"))
         story.append(Spacer(1, 20))
         
-        story.append(Paragraph("Atentamente,", self.styles['Normal']))
+        story.append(static("atentamente"))
         story.append(Spacer(1, 40))
         
-        story.append(Paragraph("_" * 40, self.styles['Normal']))
-        story.append(Paragraph(f"<b>{nombre_completo}</b>", self.styles['Normal']))
-        story.append(Paragraph(f"C.C. {cedula}", self.styles['Normal']))
+        story.append(static("firma"))
+        story.append(Paragraph(f"<b>{nombre_completo}</b>", normal))
+        story.append(Paragraph(f"C.C. {cedula}", normal))
         
         doc.build(story)
         buffer.seek(0)
@@ -303,12 +360,21 @@ CUARTO: Archivar definitivamente el presente proceso.
     
     def get_available_templates(self) -> dict:
         """Return available template types with descriptions."""
-        return {
-            "prescripcion": "Multa con más de 3 años de antigüedad (prescripción)",
-            "fotomulta_notificacion": "Fotomulta sin notificación oportuna (más de 3 días)",
-            "fotomulta_identificacion": "Fotomulta donde no se identifica al conductor",
-            "fotomulta_señalizacion": "Fotomulta sin señalización adecuada (500m antes)"
-        }
+        return dict(self.AVAILABLE_TEMPLATES)
+
+
+_worker_generator = None
+
+
+def render_document(**kwargs) -> bytes:
+    """
+    Generate a document and return the PDF bytes. Meant for process pools:
+    each worker process builds its generator (and styles) once.
+    """
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = DerechoPeticionGenerator()
+    return _worker_generator.generate_document(**kwargs).getvalue()
 
 
 # Test function
@@ -0,0 +1,179 @@
+"""
+Ingest additional documents into the ChromaDB collection
+Shared by the add_document.py CLI
+"""
+# Fix SQLite version for ChromaDB
+from . import _sqlite_shim  # noqa: F401
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+import chromadb
+from openai import OpenAI, RateLimitError
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from .clients import get_openai_client
+from .rag import (
+    extract_metadata_from_text, batch_texts_for_embedding, iter_article_segments, split_articles,
+    to_unit_float32,
+    MAX_BATCH_ITEMS, MAX_WRITE_BATCH, EMBEDDING_DIMENSIONS, COLLECTION_METADATA
+)
+
+# Constants
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+COLLECTION_NAME = "codigo_transito" if EMBEDDING_DIMENSIONS == 1536 else f"codigo_transito_d{EMBEDDING_DIMENSIONS}"
+EMBEDDING_MODEL = "text-embedding-3-small"
+PERSIST_DIR = "./chroma_db"
+# Embedding requests in flight at once (keep low enough to stay under TPM limits)
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = 5
+
+# Built lazily on first use and reused across documents
+_SPLITTER = None
+
+
+def get_embeddings_batch(client: OpenAI, texts: list) -> np.ndarray:
+    """Get unit-length float32 embeddings for a batch, backing off on rate limits."""
+    for attempt in range(EMBEDDING_MAX_RETRIES):
+        try:
+            response = client.embeddings.create(
+                model=EMBEDDING_MODEL,
+                input=texts,
+                dimensions=EMBEDDING_DIMENSIONS
+            )
+            return to_unit_float32([item.embedding for item in response.data])
+        except RateLimitError:
+            if attempt == EMBEDDING_MAX_RETRIES - 1:
+                raise
+            delay = 2 ** attempt
+            print(f"Rate limited, retrying in {delay}s...")
+            time.sleep(delay)
+
+
+def iter_chunks(file_path: str) -> Iterator[str]:
+    """Stream article-aligned chunks from a document."""
+    global _SPLITTER
+    if _SPLITTER is None:
+        _SPLITTER = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            separators=["\nARTÍCULO", "\nCAPITULO", "\nTÍTULO", "\n\n", "\n", " "]
+        )
+    
+    for chunk, _ in split_articles(iter_article_segments(file_path), _SPLITTER):
+        yield chunk
+
+
+def iter_chunk_records(
+    chunks: Iterable[str],
+    doc_prefix: str,
+    extract_metadata: bool = True
+) -> Iterator[Tuple[str, dict]]:
+    """
+    Pair each chunk with its metadata. With extract_metadata, article/title/chapter
+    are parsed from each chunk and propagated to the chunks that follow.
+    """
+    if not extract_metadata:
+        for i, chunk in enumerate(chunks):
+            yield chunk, {"source": doc_prefix, "chunk_index": i}
+        return
+    
+    # Track current article/title/chapter for context propagation
+    current_title = None
+    current_chapter = None
+    current_article = None
+    
+    for i, chunk in enumerate(chunks):
+        extracted = extract_metadata_from_text(chunk, doc_prefix)
+        
+        # Update current context if new info found
+        if extracted["title"]:
+            current_title = extracted["title"]
+        if extracted["chapter"]:
+            current_chapter = extracted["chapter"]
+        if extracted["article"]:
+            current_article = extracted["article"]
+        
+        # Use current context for chunks without explicit info
+        # ChromaDB doesn't accept None values, so use empty string as fallback
+        yield chunk, {
+            "source": doc_prefix,
+            "chunk_index": i,
+            "article": extracted["article"] or current_article or "",
+            "title": extracted["title"] or current_title or "",
+            "chapter": extracted["chapter"] or current_chapter or "",
+        }
+
+
+def batched(iterable: Iterable, n: int) -> Iterator[list]:
+    """Yield successive lists of up to n items (itertools.batched before 3.12)."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, n)):
+        yield batch
+
+
+def embed_texts(client: OpenAI, texts: List[str], batch_size: int, concurrency: int) -> np.ndarray:
+    """
+    Embed texts with several requests in flight; the network round-trip
+    dominates, so this divides wall time by roughly the concurrency.
+    """
+    embeddings_out = np.empty((len(texts), EMBEDDING_DIMENSIONS), dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(get_embeddings_batch, client, batch): i
+            for i, batch in batch_texts_for_embedding(texts, max_items=batch_size)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            embeddings = future.result()
+            embeddings_out[i:i + len(embeddings)] = embeddings
+    return embeddings_out
+
+
+def add_document(
+    file_path: str,
+    doc_prefix: str,
+    extract_metadata: bool = True,
+    batch_size: int = MAX_BATCH_ITEMS,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+    persist_dir: str = PERSIST_DIR
+):
+    """Add a new document to the existing collection, optionally with article/section metadata."""
+    openai_client = get_openai_client()
+    chroma_client = chromadb.PersistentClient(path=persist_dir)
+    collection = chroma_client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata=COLLECTION_METADATA
+    )
+    
+    print(f"Current collection has {collection.count()} documents")
+    
+    # Get existing count to create unique IDs
+    existing_count = collection.count()
+    
+    # Stream chunks through in windows of MAX_WRITE_BATCH: only one window of
+    # text and embeddings is alive at a time, and each window is one bulk
+    # insert (one HNSW update) rather than one per embedding request
+    print(f"Loading and chunking: {file_path}")
+    records = iter_chunk_records(iter_chunks(file_path), doc_prefix, extract_metadata)
+    total_indexed = 0
+    for window in batched(records, MAX_WRITE_BATCH):
+        chunks = [chunk for chunk, _ in window]
+        embeddings = embed_texts(openai_client, chunks, batch_size, concurrency)
+        collection.add(
+            ids=[f"{doc_prefix}_chunk_{existing_count + total_indexed + i}" for i in range(len(chunks))],
+            embeddings=embeddings.tolist(),  # chromadb 0.4.x only accepts lists
+            documents=chunks,
+            metadatas=[metadata for _, metadata in window]
+        )
+        total_indexed += len(chunks)
+        print(f"Indexed {total_indexed} chunks...")
+    
+    print(f"Successfully indexed {total_indexed} chunks from {doc_prefix}")
+    print(f"Collection now has {collection.count()} total documents")
+    return total_indexed
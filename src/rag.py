@@ -4,33 +4,70 @@ Multi-document indexing with ChromaDB and OpenAI embeddings
 Supports: Legal codes, decrees, guides, jurisprudence
 """
 # Fix SQLite version for ChromaDB
-__import__('pysqlite3')
-import sys
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+from . import _sqlite_shim  # noqa: F401
 
 import os
 import re
+import mmap
 import hashlib
 import json
 import logging
 from pathlib import Path
-from typing import List, Tuple, Dict, Optional, Any
+from typing import List, Tuple, Dict, Optional, Any, Iterable, Iterator
 from datetime import datetime
 
+import numpy as np
 import chromadb
 from chromadb.config import Settings
-from openai import OpenAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from .clients import get_openai_client
+from .compaction import compact_chunks
+from .routing import normalize_query
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Constants
 CHUNK_SIZE = 1000  # Increased for better context
 CHUNK_OVERLAP = 200
-COLLECTION_NAME = "transito_colombia_v2"
 EMBEDDING_MODEL = "text-embedding-3-small"
-EMBEDDING_DIMENSIONS = 1536
+# ChromaDB keeps every vector as float32 with no built-in quantization, so the
+# memory lever is vector width: text-embedding-3 models can return shortened
+# (Matryoshka) embeddings. 1536 dims = 6 KiB/vector; 512 dims = 2 KiB/vector,
+# with correspondingly cheaper HNSW distance computations.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+# Vectors of different widths can't share a collection
+BASE_COLLECTION_NAME = "transito_colombia_v2"
+COLLECTION_NAME = (
+    BASE_COLLECTION_NAME if EMBEDDING_DIMENSIONS == 1536
+    else f"{BASE_COLLECTION_NAME}_d{EMBEDDING_DIMENSIONS}"
+)
+
+# HNSW parameters are fixed when a collection is created. The corpus is
+# bulk-loaded once and queried on every user turn, so pay for a denser graph at
+# build time and keep search_ef modest for serving. Existing collections keep
+# their original parameters until rebuilt (FORCE_REINDEX=true).
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+    "hnsw:num_threads": os.cpu_count() or 1,
+}
+
+# Size of the bot's exact-repeat query embedding cache
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+
+# Embedding request limits (text-embedding-3-small accepts up to 2048 inputs and
+# ~300k tokens per call). Tokens are estimated from characters to avoid a
+# tokenizer dependency; 3 chars/token is conservative for Spanish legal text.
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 250_000
+CHARS_PER_TOKEN = 3
+
+# Max records per ChromaDB add/upsert (its SQLite backend caps a batch at ~5461)
+MAX_WRITE_BATCH = 5000
 
 # Document source metadata - for citation and display
 # Priority: 1 = highest (laws, constitution), 2 = medium (decrees, jurisprudence), 3 = lower (guides)
@@ -304,6 +341,25 @@ SENTENCIAS_URLS = {
     "C-980": "https://www.corteconstitucional.gov.co/relatoria/2010/C-980-10.htm",
 }
 
+# Metadata extraction patterns, compiled once at import (run for every chunk)
+ARTICLE_PATTERN = re.compile(r'[Aa]rt[íi]culo\.?\s*(\d+[A-Za-z]?)[\.\-\s:]')
+TITLE_PATTERN = re.compile(r'T[ÍI]TULO\s+([IVXLCDM]+|[\d]+)[\.\-\s]*([^\n]*)?', re.IGNORECASE)
+CHAPTER_PATTERN = re.compile(r'CAP[ÍI]TULO\s+([IVXLCDM]+|[\d]+)[\.\-\s]*([^\n]*)?', re.IGNORECASE)
+SENTENCIA_PATTERN = re.compile(r'(?:Sentencia\s+)?([CTSU]-\d+)\s+de\s+(\d{4})', re.IGNORECASE)
+LEY_PATTERN = re.compile(r'Ley\s+(\d+)\s+de\s+(\d{4})', re.IGNORECASE)
+DECRETO_PATTERN = re.compile(r'Decreto\s+(\d+)\s+de\s+(\d{4})', re.IGNORECASE)
+SECTION_PATTERN = re.compile(r'^[=]+\n([^\n=]+)\n[=]+', re.MULTILINE)
+SENTENCIA_CODE_PATTERN = re.compile(r'([CTSU]-\d+)')
+# "ARTÍCULO <n>" headings (number may sit on the next line), matched on the raw
+# UTF-8 bytes so documents can be segmented straight from a memory map
+ARTICLE_BOUNDARY_PATTERN = re.compile(re.escape("\nARTÍCULO".encode("utf-8")) + rb"\s+\d+")
+
+# Articles up to this size are indexed whole; larger ones are sub-split
+MAX_ARTICLE_CHUNK_SIZE = CHUNK_SIZE * 2
+
+# Text splitters are cached per document type (see RAGPipeline._create_text_splitter)
+_TEXT_SPLITTERS: Dict[str, RecursiveCharacterTextSplitter] = {}
+
 
 def extract_metadata_from_text(text: str, source_id: str) -> Dict[str, Optional[str]]:
     """
@@ -321,48 +377,41 @@ def extract_metadata_from_text(text: str, source_id: str) -> Dict[str, Optional[
     }
     
     # Pattern for articles: "Artículo 123" or "ARTÍCULO 123"
-    article_pattern = r'[Aa]rt[íi]culo\.?\s*(\d+[A-Za-z]?)[\.\-\s:]'
-    article_match = re.search(article_pattern, text)
+    article_match = ARTICLE_PATTERN.search(text)
     if article_match:
         info["article"] = f"Artículo {article_match.group(1)}"
     
     # Pattern for titles: "TÍTULO I" or "Título II"
-    title_pattern = r'T[ÍI]TULO\s+([IVXLCDM]+|[\d]+)[\.\-\s]*([^\n]*)?'
-    title_match = re.search(title_pattern, text, re.IGNORECASE)
+    title_match = TITLE_PATTERN.search(text)
     if title_match:
         title_num = title_match.group(1)
         title_name = title_match.group(2).strip() if title_match.group(2) else ""
         info["title"] = f"Título {title_num}" + (f" - {title_name}" if title_name else "")
     
     # Pattern for chapters: "CAPÍTULO I"
-    chapter_pattern = r'CAP[ÍI]TULO\s+([IVXLCDM]+|[\d]+)[\.\-\s]*([^\n]*)?'
-    chapter_match = re.search(chapter_pattern, text, re.IGNORECASE)
+    chapter_match = CHAPTER_PATTERN.search(text)
     if chapter_match:
         chap_num = chapter_match.group(1)
         chap_name = chapter_match.group(2).strip() if chapter_match.group(2) else ""
         info["chapter"] = f"Capítulo {chap_num}" + (f" - {chap_name}" if chap_name else "")
     
     # Pattern for sentencias: "C-530 de 2003" or "Sentencia C-038 de 2020"
-    sentencia_pattern = r'(?:Sentencia\s+)?([CTSU]-\d+)\s+de\s+(\d{4})'
-    sentencia_match = re.search(sentencia_pattern, text, re.IGNORECASE)
+    sentencia_match = SENTENCIA_PATTERN.search(text)
     if sentencia_match:
         info["sentencia"] = f"Sentencia {sentencia_match.group(1)} de {sentencia_match.group(2)}"
     
     # Pattern for laws: "Ley 769 de 2002"
-    ley_pattern = r'Ley\s+(\d+)\s+de\s+(\d{4})'
-    ley_match = re.search(ley_pattern, text, re.IGNORECASE)
+    ley_match = LEY_PATTERN.search(text)
     if ley_match:
         info["ley"] = f"Ley {ley_match.group(1)} de {ley_match.group(2)}"
     
     # Pattern for decrees: "Decreto 2106 de 2019"
-    decreto_pattern = r'Decreto\s+(\d+)\s+de\s+(\d{4})'
-    decreto_match = re.search(decreto_pattern, text, re.IGNORECASE)
+    decreto_match = DECRETO_PATTERN.search(text)
     if decreto_match:
         info["decreto"] = f"Decreto {decreto_match.group(1)} de {decreto_match.group(2)}"
     
     # Section headers (common in guides)
-    section_pattern = r'^[=]+\n([^\n=]+)\n[=]+'
-    section_match = re.search(section_pattern, text, re.MULTILINE)
+    section_match = SECTION_PATTERN.search(text)
     if section_match:
         info["section"] = section_match.group(1).strip()
     
@@ -413,7 +462,7 @@ def get_citation_url(metadata: Dict) -> Optional[str]:
     # Check for sentencia-specific URL
     if metadata.get("sentencia"):
         # Extract sentencia code (e.g., "C-038" from "Sentencia C-038 de 2020")
-        sentencia_match = re.search(r'([CTSU]-\d+)', metadata["sentencia"])
+        sentencia_match = SENTENCIA_CODE_PATTERN.search(metadata["sentencia"])
         if sentencia_match:
             sentencia_code = sentencia_match.group(1)
             if sentencia_code in SENTENCIAS_URLS:
@@ -462,7 +511,10 @@ def format_citation_link(metadata: Dict) -> str:
     return citation_text
 
 
-def format_context_for_citations(results: List[Tuple[str, float, Dict]]) -> str:
+def format_context_for_citations(
+    results: List[Tuple[str, float, Dict]],
+    include_relevance: bool = True
+) -> str:
     """
     Format RAG results into context that includes citation information for LLM.
     This provides the LLM with source URLs to create hyperlinked citations.
@@ -497,17 +549,146 @@ def format_context_for_citations(results: List[Tuple[str, float, Dict]]) -> str:
         if metadata.get("decreto"):
             citation_info.append(f"Decreto: {metadata['decreto']}")
         
-        relevance_pct = int(relevance * 100)
         citation_header = " | ".join(citation_info)
         
-        context_parts.append(
-            f"--- Fragmento {i} (Relevancia: {relevance_pct}%) ---\n"
-            f"{citation_header}\n\n{doc}"
-        )
+        if include_relevance:
+            relevance_pct = int(relevance * 100)
+            fragment_header = f"--- Fragmento {i} (Relevancia: {relevance_pct}%) ---"
+        else:
+            fragment_header = f"--- Fragmento {i} ---"
+        context_parts.append(f"{fragment_header}\n{citation_header}\n\n{doc}")
     
     return "\n\n".join(context_parts)
 
 
+def _article_number(metadata: Dict) -> float:
+    """Numeric article for ordering ("Artículo 131" -> 131); unnumbered chunks sort last."""
+    match = re.search(r'\d+', metadata.get("article") or "")
+    return int(match.group()) if match else float("inf")
+
+
+def build_context_pack(results: List[Tuple[str, float, Dict]]) -> Tuple[str, str]:
+    """
+    Build a deterministic context "pack" from retrieved chunks.
+    
+    Chunks are ordered by (source priority, source, article number, content)
+    and per-query relevance scores are left out, so near-duplicate queries that
+    retrieve the same chunks produce byte-identical context. Chunk text is
+    compacted (compact_chunks) to save prompt tokens. Returns the context
+    text and a short version hash usable as a cache key.
+    """
+    ordered = sorted(results, key=lambda r: (
+        r[2].get("source_priority", 5),
+        r[2].get("source", ""),
+        _article_number(r[2]),
+        compute_chunk_hash(r[0])
+    ))
+    compacted = compact_chunks(doc for doc, _, _ in ordered)
+    ordered = [
+        (doc, relevance, metadata)
+        for doc, (_, relevance, metadata) in zip(compacted, ordered)
+        if doc
+    ]
+    text = format_context_for_citations(ordered, include_relevance=False)
+    version = hashlib.md5(text.encode('utf-8')).hexdigest()[:8]
+    return text, version
+
+
+def iter_article_segments(file_path: str) -> Iterator[str]:
+    """
+    Stream a legal document one ARTÍCULO segment at a time (any preamble is its
+    own segment). The file is memory-mapped and only the current segment is
+    decoded, so the whole document is never held as a Python str.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            for match in ARTICLE_BOUNDARY_PATTERN.finditer(mm):
+                if match.start() > start:
+                    yield mm[start:match.start()].decode('utf-8')
+                start = match.start()
+            yield mm[start:].decode('utf-8')
+
+
+def split_articles(
+    segments: Iterable[str], 
+    splitter: RecursiveCharacterTextSplitter
+) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Structure-aware split for laws and decrees.
+    Each article segment becomes one chunk; only articles longer than
+    MAX_ARTICLE_CHUNK_SIZE are sub-split with the recursive splitter.
+    Yields (chunk_text, parent_id) tuples as each segment is read, where
+    parent_id links the sub-chunks of the same article (None for articles
+    kept whole).
+    """
+    for segment in segments:
+        segment = segment.strip()
+        if not segment:
+            continue
+        if len(segment) <= MAX_ARTICLE_CHUNK_SIZE:
+            yield segment, None
+            continue
+        
+        parent_id = compute_chunk_hash(segment)
+        for sub_chunk in splitter.split_text(segment):
+            yield sub_chunk, parent_id
+
+
+def to_unit_float32(vectors: List[List[float]]) -> np.ndarray:
+    """
+    Pack embeddings into a contiguous float32 array with L2-normalized rows.
+    A float32 row takes 4 bytes per dimension versus ~32 for a list of Python
+    floats, and unit rows make cosine similarity a plain dot product.
+    """
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+    return np.ascontiguousarray(arr / np.where(norms == 0, 1, norms))
+
+
+def compute_file_hash(file_path: Path) -> str:
+    """MD5 of a file, read in blocks rather than all at once."""
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap upper-bound token estimate used to size embedding batches."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def batch_texts_for_embedding(
+    texts: List[str],
+    max_items: int = MAX_BATCH_ITEMS
+) -> List[Tuple[int, List[str]]]:
+    """
+    Greedily group texts into embedding requests bounded by max_items
+    and MAX_BATCH_TOKENS, preserving input order.
+    Returns list of (start_index, texts) tuples.
+    """
+    batches = []
+    start = 0
+    current: List[str] = []
+    current_tokens = 0
+    
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > MAX_BATCH_TOKENS):
+            batches.append((start, current))
+            start, current, current_tokens = i, [], 0
+        current.append(text)
+        current_tokens += tokens
+    
+    if current:
+        batches.append((start, current))
+    return batches
+
+
 def compute_chunk_hash(text: str) -> str:
     """Compute a hash for a text chunk for deduplication."""
     return hashlib.md5(text.encode('utf-8')).hexdigest()[:12]
@@ -526,13 +707,13 @@ class RAGPipeline:
     def __init__(self, persist_directory: str = "./chroma_db"):
         """Initialize RAG pipeline with ChromaDB and OpenAI."""
         self.persist_directory = persist_directory
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.openai_client = get_openai_client()
         
         # Initialize ChromaDB with persistence
         self.chroma_client = chromadb.PersistentClient(path=persist_directory)
         self.collection = self.chroma_client.get_or_create_collection(
             name=COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"}
+            metadata=COLLECTION_METADATA
         )
         
         # Track indexed documents
@@ -560,32 +741,63 @@ class RAGPipeline:
         except Exception as e:
             logger.warning(f"Could not save index state: {e}")
     
-    def _get_embedding(self, text: str) -> List[float]:
-        """Get embedding for a single text using OpenAI."""
+    def index_version(self) -> str:
+        """Short hash of the indexed files' contents; changes whenever the index does."""
+        files = self._index_state.get("indexed_files", {})
+        digest = hashlib.md5(
+            json.dumps({path: info.get("hash") for path, info in files.items()}, sort_keys=True).encode('utf-8')
+        )
+        return digest.hexdigest()[:8]
+    
+    def reset_collection(self):
+        """Drop and recreate the collection so it is rebuilt with COLLECTION_METADATA."""
+        try:
+            self.chroma_client.delete_collection(name=COLLECTION_NAME)
+        except Exception as e:
+            logger.warning(f"Could not delete collection {COLLECTION_NAME}: {e}")
+        self.collection = self.chroma_client.create_collection(
+            name=COLLECTION_NAME,
+            metadata=COLLECTION_METADATA
+        )
+        self._index_state["indexed_files"] = {}
+        self._save_index_state()
+        logger.info(f"Collection {COLLECTION_NAME} recreated")
+    
+    def _get_embedding(self, text: str) -> np.ndarray:
+        """Get embedding for a single text using OpenAI (unit-length float32)."""
         response = self.openai_client.embeddings.create(
             model=EMBEDDING_MODEL,
-            input=text
+            input=text,
+            dimensions=EMBEDDING_DIMENSIONS
         )
-        return response.data[0].embedding
+        return to_unit_float32(response.data[0].embedding)
     
-    def _get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings for multiple texts in batch."""
-        # OpenAI has a limit, process in sub-batches if needed
-        max_batch = 100
-        all_embeddings = []
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a user query (normalized, so equivalent phrasings embed the same)."""
+        return self._get_embedding(normalize_query(query))
+    
+    def _get_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+        """Get embeddings for multiple texts in batch, as an (n, dims) float32 array."""
+        all_embeddings = np.empty((len(texts), EMBEDDING_DIMENSIONS), dtype=np.float32)
         
-        for i in range(0, len(texts), max_batch):
-            batch = texts[i:i + max_batch]
+        # OpenAI has per-request item/token limits, process in sub-batches if needed
+        for start, batch in batch_texts_for_embedding(texts):
             response = self.openai_client.embeddings.create(
                 model=EMBEDDING_MODEL,
-                input=batch
+                input=batch,
+                dimensions=EMBEDDING_DIMENSIONS
+            )
+            all_embeddings[start:start + len(batch)] = to_unit_float32(
+                [item.embedding for item in response.data]
             )
-            all_embeddings.extend([item.embedding for item in response.data])
         
         return all_embeddings
     
     def _create_text_splitter(self, doc_type: str = "legal") -> RecursiveCharacterTextSplitter:
-        """Create appropriate text splitter based on document type."""
+        """Create (or reuse) the text splitter for a document type."""
+        if doc_type in _TEXT_SPLITTERS:
+            return _TEXT_SPLITTERS[doc_type]
+        
         if doc_type in ["ley", "decreto"]:
             # Legal documents: split on article boundaries
             separators = [
@@ -612,12 +824,14 @@ class RAGPipeline:
             # Default
             separators = ["\n\n", "\n", ". ", " "]
         
-        return RecursiveCharacterTextSplitter(
+        splitter = RecursiveCharacterTextSplitter(
             chunk_size=CHUNK_SIZE,
             chunk_overlap=CHUNK_OVERLAP,
             separators=separators,
             length_function=len
         )
+        _TEXT_SPLITTERS[doc_type] = splitter
+        return splitter
     
     def load_and_chunk_document(
         self, 
@@ -629,18 +843,30 @@ class RAGPipeline:
         Load document and split into chunks with metadata.
         Returns list of (chunk_text, metadata) tuples.
         """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            text = f.read()
-        
         splitter = self._create_text_splitter(doc_type)
-        chunks = splitter.split_text(text)
+        if doc_type in ["ley", "decreto"]:
+            # Keep articles intact so each embedding covers one coherent provision
+            chunks = split_articles(iter_article_segments(file_path), splitter)
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            chunks = [(chunk, None) for chunk in splitter.split_text(text)]
         
         # Enrich each chunk with metadata
         enriched_chunks = []
-        for i, chunk in enumerate(chunks):
+        parent_articles = {}
+        for i, (chunk, parent_id) in enumerate(chunks):
             # Extract metadata from chunk content
             extracted_meta = extract_metadata_from_text(chunk, source_id)
             
+            # Sub-chunks of a long article inherit the article number from its heading
+            if parent_id:
+                extracted_meta["parent_id"] = parent_id
+                if extracted_meta["article"]:
+                    parent_articles.setdefault(parent_id, extracted_meta["article"])
+                else:
+                    extracted_meta["article"] = parent_articles.get(parent_id)
+            
             # Build full metadata
             source_info = SOURCE_METADATA.get(source_id, {})
             metadata = {
@@ -674,10 +900,12 @@ class RAGPipeline:
             return 0
         
         # Check if already indexed (by file hash)
-        file_hash = hashlib.md5(file_path.read_bytes()).hexdigest()
+        file_hash = compute_file_hash(file_path)
         indexed_info = self._index_state.get("indexed_files", {}).get(str(file_path), {})
         
-        if not force_reindex and indexed_info.get("hash") == file_hash:
+        # Entries written before per-collection tracking belong to the base collection
+        indexed_collection = indexed_info.get("collection", BASE_COLLECTION_NAME)
+        if not force_reindex and indexed_info.get("hash") == file_hash and indexed_collection == COLLECTION_NAME:
             logger.info(f"Document already indexed (hash match): {file_path.name}")
             return indexed_info.get("chunk_count", 0)
         
@@ -708,31 +936,39 @@ class RAGPipeline:
             except Exception as e:
                 logger.warning(f"Could not delete old chunks: {e}")
         
-        # Process and index in batches
-        batch_size = 50
-        total_indexed = 0
+        # Embed everything, then write in as few ChromaDB calls as possible so the
+        # HNSW index is updated in bulk rather than once per small batch
+        ids, texts, metadatas = [], [], []
+        seen_ids = set()
+        for text, metadata in chunks_with_meta:
+            chunk_id = f"{source_id}_{metadata['chunk_hash']}"
+            # Identical chunks share an ID; a single upsert rejects duplicates
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            ids.append(chunk_id)
+            texts.append(text)
+            metadatas.append(metadata)
         
-        for i in range(0, len(chunks_with_meta), batch_size):
-            batch = chunks_with_meta[i:i + batch_size]
-            texts = [c[0] for c in batch]
-            metadatas = [c[1] for c in batch]
-            ids = [f"{source_id}_{m['chunk_hash']}" for _, m in batch]
-            
-            logger.info(f"Embedding batch {i // batch_size + 1}/{(len(chunks_with_meta) - 1) // batch_size + 1}...")
-            embeddings = self._get_embeddings_batch(texts)
-            
+        logger.info(f"Embedding {len(texts)} chunks...")
+        embeddings = self._get_embeddings_batch(texts)
+        
+        total_indexed = 0
+        for i in range(0, len(texts), MAX_WRITE_BATCH):
+            end = i + MAX_WRITE_BATCH
             self.collection.upsert(
-                ids=ids,
-                embeddings=embeddings,
-                documents=texts,
-                metadatas=metadatas
+                ids=ids[i:end],
+                embeddings=embeddings[i:end].tolist(),  # chromadb 0.4.x only accepts lists
+                documents=texts[i:end],
+                metadatas=metadatas[i:end]
             )
-            total_indexed += len(batch)
+            total_indexed += len(texts[i:end])
         
         # Update index state
         self._index_state.setdefault("indexed_files", {})[str(file_path)] = {
             "hash": file_hash,
             "source_id": source_id,
+            "collection": COLLECTION_NAME,
             "chunk_count": total_indexed,
             "indexed_at": datetime.now().isoformat()
         }
@@ -777,15 +1013,28 @@ class RAGPipeline:
         Returns:
             List of (document, relevance_score, metadata) tuples
         """
-        query_embedding = self._get_embedding(query)
-        
+        return self.retrieve_by_embedding(
+            self.embed_query(query), n_results, source_filter, min_relevance
+        )
+    
+    def retrieve_by_embedding(
+        self,
+        query_embedding: np.ndarray,
+        n_results: int = 5,
+        source_filter: Optional[List[str]] = None,
+        min_relevance: float = 0.0
+    ) -> List[Tuple[str, float, Dict]]:
+        """
+        Retrieve top N relevant chunks for an already embedded query (a unit
+        float32 vector from embed_query); same arguments and results as retrieve.
+        """
         # Build where clause for filtering
         where = None
         if source_filter:
             where = {"source": {"$in": source_filter}}
         
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=[query_embedding.tolist()],  # chromadb 0.4.x only accepts lists
             n_results=n_results * 2,  # Get more, filter later
             where=where,
             include=["documents", "distances", "metadatas"]
@@ -870,6 +1119,22 @@ class RAGPipeline:
         
         return "\n\n".join(context_parts)
     
+    def get_context_pack(self, query: str, n_results: int = 5) -> Tuple[str, str]:
+        """
+        Get the deterministic context pack for a query (see build_context_pack).
+        
+        Returns:
+            (context text, version hash); the version is "" when nothing was found
+        """
+        return self.get_context_pack_for_embedding(self.embed_query(query), n_results)
+    
+    def get_context_pack_for_embedding(self, query_embedding: np.ndarray, n_results: int = 5) -> Tuple[str, str]:
+        """Get the context pack for an already embedded query, skipping re-embedding."""
+        results = self.retrieve_by_embedding(query_embedding, n_results)
+        if not results:
+            return "No se encontraron artículos o normas relevantes en la base de datos.", ""
+        return build_context_pack(results)
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the indexed documents."""
         total_docs = self.collection.count()
@@ -891,7 +1156,8 @@ class RAGPipeline:
             "by_source": source_counts,
             "index_state": self._index_state,
             "collection_name": COLLECTION_NAME,
-            "embedding_model": EMBEDDING_MODEL
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_dimensions": EMBEDDING_DIMENSIONS
         }
 
 
@@ -936,6 +1202,10 @@ def initialize_rag(
     """Initialize and index the RAG pipeline with all available documents."""
     rag = RAGPipeline(persist_directory=persist_directory)
     
+    # A forced reindex rebuilds the collection so HNSW parameter changes take effect
+    if force_reindex:
+        rag.reset_collection()
+    
     # Get documents to index
     docs_config = get_default_documents_config(base_path)
     
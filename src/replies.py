@@ -0,0 +1,34 @@
+"""
+Reply text helpers for the Telegram bot
+Telegram rejects messages over 4096 characters, so long answers are sent as
+several messages
+"""
+from typing import List
+
+TELEGRAM_MAX_MESSAGE_CHARS = 4096
+# Parts leave room for the " ▌" cursor shown while an answer is streaming, so
+# the streamed and final text of a message always differ
+MESSAGE_PART_CHARS = TELEGRAM_MAX_MESSAGE_CHARS - 2
+PART_SEPARATORS = ("\n\n", "\n", " ")
+
+
+def split_message(text: str, limit: int = MESSAGE_PART_CHARS) -> List[str]:
+    """
+    Split text into parts of at most limit characters, breaking at a
+    paragraph, line or word boundary in the second half of each part when
+    there is one. As a streamed text grows, every part but the last stays
+    the same.
+    """
+    parts = []
+    while len(text) > limit:
+        for separator in PART_SEPARATORS:
+            cut = text.rfind(separator, limit // 2, limit)
+            if cut > 0:
+                break
+        else:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        parts.append(text)
+    return parts
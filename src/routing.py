@@ -0,0 +1,42 @@
+"""
+Query normalization and model routing
+Short lookups get a cheaper model and a tighter completion budget. Kept free
+of telegram and chromadb imports so the classifier can be tested on its own
+"""
+import re
+from typing import Tuple
+
+# Short lookups ("qué dice el art 131") get a tighter completion budget (and
+# LLM_SIMPLE_MODEL if set); questions asking how to contest something keep the full one
+SIMPLE_QUERY_MAX_WORDS = 12
+SIMPLE_QUERY_MAX_TOKENS = 400
+SIMPLE_QUERY_PATTERN = re.compile(
+    r'\bart(?:[íi]culo|\.)?\s*\d+|\bqu[ée] (?:dice|es|significa)\b|'
+    r'\bcu[áa]nto (?:es|vale|cuesta)\b|\bcu[áa]l es\b'
+)
+COMPLEX_QUERY_PATTERN = re.compile(
+    r'defend|tumb|impugn|apela|recurso|procedimiento|descargos|paso a paso|'
+    r'\bc[óo]mo\b|\bqu[ée] hago\b|\bpor qu[ée]\b'
+)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a user query for cache lookups (case and whitespace)."""
+    return " ".join(query.lower().split())
+
+
+def is_simple_query(query: str) -> bool:
+    """Whether a query is a short lookup that needs only a brief answer."""
+    normalized = normalize_query(query)
+    return (
+        len(normalized.split()) <= SIMPLE_QUERY_MAX_WORDS
+        and SIMPLE_QUERY_PATTERN.search(normalized) is not None
+        and COMPLEX_QUERY_PATTERN.search(normalized) is None
+    )
+
+
+def route_query(query: str, model: str, simple_model: str, max_tokens: int) -> Tuple[str, int]:
+    """Pick the model and completion budget for a query (simple lookups get simple_model)."""
+    if is_simple_query(query):
+        return simple_model, min(max_tokens, SIMPLE_QUERY_MAX_TOKENS)
+    return model, max_tokens
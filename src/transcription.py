@@ -0,0 +1,60 @@
+"""
+Joining Whisper transcripts of overlapping voice-note segments
+Long voice notes are cut into segments that overlap by a second, so a word
+at a cut is heard whole by at least one segment; the repeated words are
+dropped when the transcripts are joined
+"""
+import re
+from typing import List, Sequence
+
+# Seconds shared by consecutive segments (about two or three spoken words)
+VOICE_SEGMENT_OVERLAP_SECONDS = 1
+# Longest run of repeated words looked for at a segment boundary
+MAX_OVERLAP_WORDS = 8
+_NON_WORD = re.compile(r'\W+')
+
+
+def _normalize(words: Sequence[str]) -> List[str]:
+    """Compare words without case or punctuation ("Tránsito," == "tránsito")."""
+    return [_NON_WORD.sub("", word.lower()) for word in words]
+
+
+def _find_overlap(previous: List[str], following: List[str], max_words: int):
+    """
+    Find the words repeated where two transcripts meet. Returns (keep, skip):
+    keep the first keep words of previous, then following from skip. Either
+    transcript may end or start with a word clipped by the cut ("trán" for
+    "tránsito"); it is dropped when the rest of that word is heard on the
+    other side of the repeated run. The run is taken from previous except its
+    last word, which Whisper tends to end with a period at a segment's end.
+    """
+    prev_norm, next_norm = _normalize(previous), _normalize(following)
+    for length in range(min(max_words, len(previous), len(following)), 0, -1):
+        for clipped_prev, clipped_next in ((0, 0), (1, 0), (0, 1)):
+            end = len(previous) - clipped_prev
+            start = end - length
+            if start < 0 or clipped_next + length > len(following):
+                continue
+            if prev_norm[start:end] != next_norm[clipped_next:clipped_next + length]:
+                continue
+            if clipped_prev and not (
+                clipped_next + length < len(following)
+                and next_norm[clipped_next + length].startswith(prev_norm[-1])
+            ):
+                continue
+            if clipped_next and not (start > 0 and prev_norm[start - 1].endswith(next_norm[0])):
+                continue
+            return end - 1, clipped_next + length - 1
+    return len(previous), 0
+
+
+def merge_transcripts(texts: Sequence[str], max_overlap_words: int = MAX_OVERLAP_WORDS) -> str:
+    """Join the transcripts of consecutive overlapping segments, dropping repeated words."""
+    words: List[str] = []
+    for text in texts:
+        following = text.split()
+        if not following:
+            continue
+        keep, skip = _find_overlap(words, following, max_overlap_words)
+        words = words[:keep] + following[skip:]
+    return " ".join(words)
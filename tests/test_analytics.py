@@ -37,8 +37,17 @@ class TestAnalytics:
         # Check users table exists
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
         assert cursor.fetchone() is not None
-        
-        conn.close()
+    
+    def test_daily_count_uses_composite_index(self, temp_db):
+        """Test the per-user daily count is served by the composite index."""
+        conn = temp_db.get_connection()
+        plan = conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT COUNT(*) FROM queries
+            WHERE user_id = ? AND query_type IN ('text', 'voice')
+            AND timestamp >= date('now') AND timestamp < date('now', '+1 day')
+        """, (1,)).fetchall()
+        assert any("idx_queries_user_type_ts" in row['detail'] for row in plan)
     
     def test_track_query(self, temp_db):
         """Test query tracking."""
@@ -131,6 +140,119 @@ class TestAnalytics:
         count = temp_db.get_user_daily_count(user_id)
         assert count == 3  # text and voice both count
 
+    
+    def test_connection_reused_per_thread(self, temp_db):
+        """Test the same thread gets the same persistent connection."""
+        assert temp_db.get_connection() is temp_db.get_connection()
+        mode = temp_db.get_connection().execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+    
+    def test_flush_writes_queued_queries(self, temp_db):
+        """Test queued queries and their users are written on flush."""
+        for i in range(5):
+            temp_db.track_query(55555, "batch", "Batch", 'text', f'Query {i}')
+        temp_db.flush()
+        
+        conn = temp_db.get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM queries WHERE user_id = 55555").fetchone()[0]
+        assert count == 5
+        user = conn.execute("SELECT username FROM users WHERE user_id = 55555").fetchone()
+        assert user['username'] == "batch"
+
+    
+    def test_rate_limit_counter_tracks_new_queries(self, temp_db):
+        """Test the in-memory daily counter follows queries after the first check."""
+        user_id = 66666
+        assert temp_db.check_rate_limit(user_id, daily_limit=10) == (True, 10)
+        
+        temp_db.track_query(user_id, None, None, 'text', 'Query 1')
+        temp_db.track_query(user_id, None, None, 'voice', 'Query 2')
+        temp_db.track_query(user_id, None, None, 'command', '/start')  # not rate-limited
+        
+        assert temp_db.check_rate_limit(user_id, daily_limit=10) == (True, 8)
+        assert temp_db.get_user_daily_count(user_id) == 2
+
+    
+    def test_flush_splits_large_batches(self, temp_db):
+        """Test flush drains the whole queue in bounded transactions."""
+        with patch.object(temp_db, 'FLUSH_BATCH_SIZE', 2):
+            for i in range(5):
+                temp_db.track_query(44444, None, None, 'text', f'Query {i}')
+            temp_db.flush()
+        
+        assert temp_db.get_stats()['total_queries'] == 5
+
+    
+    def test_repeat_queries_keep_user_names(self, temp_db):
+        """Test touch-only updates for known users still pick up name changes."""
+        temp_db.track_query(33333, "old_name", "Old", 'text', 'Query 1')
+        temp_db.flush()
+        temp_db.track_query(33333, "old_name", "Old", 'text', 'Query 2')
+        temp_db.track_query(33333, None, None, 'text', 'Query 3')
+        temp_db.flush()
+        temp_db.track_query(33333, "new_name", "Old", 'text', 'Query 4')
+        
+        users = temp_db.get_user_list()
+        assert len(users) == 1
+        assert users[0]['username'] == "new_name"
+        assert users[0]['query_count'] == 4
+    
+    def test_known_users_bounded(self, temp_db):
+        """Test the known-user cache stays at its size and evicted users still upsert."""
+        with patch.object(temp_db, '_KNOWN_USERS', temp_db.LRUCache(maxsize=2)):
+            for user_id in range(5):
+                temp_db.track_query(user_id, f"user{user_id}", "Test", 'text', 'Query')
+            temp_db.flush()
+            assert len(temp_db._KNOWN_USERS) == 2
+            temp_db.track_query(0, "renamed", None, 'text', 'Query')
+        
+        users = {user['user_id']: user for user in temp_db.get_user_list()}
+        assert len(users) == 5
+        assert users[0]['username'] == "renamed"
+        assert users[0]['first_name'] == "Test"
+
+    
+    def test_daily_counters_reset_at_day_change(self, temp_db):
+        """Test counters from an earlier day are dropped and re-seeded."""
+        from datetime import date
+        user_id = 22222
+        with patch.object(temp_db, '_today', return_value=date(2020, 1, 1)):
+            temp_db.check_rate_limit(user_id, daily_limit=10)
+            temp_db.check_rate_limit(77777, daily_limit=10)
+            assert temp_db.has_daily_count(user_id)
+        
+        assert not temp_db.has_daily_count(user_id)
+        assert temp_db.check_rate_limit(user_id, daily_limit=10) == (True, 10)
+        assert temp_db.has_daily_count(user_id)
+        assert 77777 not in temp_db._DAILY
+    
+    def test_seed_runs_outside_daily_lock(self, temp_db):
+        """Test the database seed doesn't hold the lock track_query needs."""
+        def seed(user_id):
+            assert not temp_db._daily_lock.locked()
+            return 3
+        
+        with patch.object(temp_db, 'get_user_daily_count', side_effect=seed):
+            assert temp_db.check_rate_limit(11111, daily_limit=10) == (True, 7)
+        assert temp_db.has_daily_count(11111)
+    
+    def test_get_recent_queries(self, temp_db):
+        """Test recent text questions are listed, skipping commands, voice notes and old rows."""
+        temp_db.track_query(1, "a", "A", "text", "multa por cinturón")
+        temp_db.track_query(1, "a", "A", "command", "/start")
+        temp_db.track_query(2, "b", "B", "voice", "[voice message]")
+        temp_db.track_query(2, "b", "B", "text", "qué es el SOAT")
+        temp_db.flush()
+        conn = temp_db.get_connection()
+        conn.execute(
+            "INSERT INTO queries (user_id, query_type, query_text, timestamp) "
+            "VALUES (3, 'text', 'vieja', datetime('now', '-3 days'))"
+        )
+        conn.commit()
+        
+        recent = temp_db.get_recent_queries(hours=24)
+        assert [q['query_text'] for q in recent] == ["multa por cinturón", "qué es el SOAT"]
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -9,6 +9,8 @@ import pytest
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from src.routing import is_simple_query, route_query, SIMPLE_QUERY_MAX_TOKENS
+
 
 class TestDerechoPeticionTrigger:
     """Tests for derecho de petición trigger regex."""
@@ -16,8 +18,8 @@ class TestDerechoPeticionTrigger:
     @pytest.fixture
     def trigger_pattern(self):
         """The regex pattern used for derecho de petición trigger."""
-        # Pattern handles both accented (ó) and non-accented (o) versions
-        return re.compile(r'(?i)(derecho.*petici[oó]n|crear.*(derecho.*petici[oó]n|documento)|petici[oó]n.*derecho)')
+        from src.document_flow import DERECHO_PETICION_PATTERN
+        return DERECHO_PETICION_PATTERN
     
     def test_matches_derecho_de_peticion_no_accent(self, trigger_pattern):
         """Test matching 'derecho de peticion' without accents."""
@@ -45,12 +47,38 @@ class TestDerechoPeticionTrigger:
         assert trigger_pattern.search("peticion de derecho")
         assert trigger_pattern.search("petición de derecho")
     
+    def test_matches_short_gaps(self, trigger_pattern):
+        """Test phrasings with a few words between the key terms still match."""
+        assert trigger_pattern.search("derecho petición")
+        assert trigger_pattern.search("derecho a petición")
+        assert trigger_pattern.search("Derechos de Petición")
+        assert trigger_pattern.search("petición por derecho propio")
+        assert trigger_pattern.search("crear mi propio documento")
+        assert trigger_pattern.search("necesito el derecho de\npetición")
+    
+    def test_no_match_distant_or_partial_terms(self, trigger_pattern):
+        """Test terms far apart in a longer question don't start the flow."""
+        assert not trigger_pattern.search(
+            "tengo derecho a saber cuánto cuesta la multa y quiero hacer una petición formal"
+        )
+        assert not trigger_pattern.search("crear cuenta en el SIMIT")
+        assert not trigger_pattern.search("derechopeticion")
+        assert not trigger_pattern.search("documento")
+    
     def test_no_match_unrelated(self, trigger_pattern):
         """Test no match for unrelated queries."""
         assert not trigger_pattern.search("multa de tránsito")
         assert not trigger_pattern.search("fotomulta")
         assert not trigger_pattern.search("velocidad máxima")
     
+    def test_long_message_matches_quickly(self, trigger_pattern):
+        """Test a long message without a trigger is rejected without backtracking."""
+        import time
+        text = "derecho " * 600 + "crear " * 600
+        start = time.perf_counter()
+        assert not trigger_pattern.search(text)
+        assert time.perf_counter() - start < 0.05
+    
     def test_matches_question_format(self, trigger_pattern):
         """Test matching question formats."""
         assert trigger_pattern.search("Como hago un derecho de peticion")
@@ -112,6 +140,10 @@ class TestSystemPromptContent:
         assert "Leyes" in system_prompt or "LEYES" in system_prompt
         assert "Decretos" in system_prompt or "DECRETOS" in system_prompt
         assert "Resoluciones" in system_prompt or "RESOLUCIONES" in system_prompt
+    
+    def test_prompt_is_static(self, system_prompt):
+        """Test that prompt has no per-request placeholders (keeps the prefix cacheable)."""
+        assert not re.search(r'\{[a-z_]+\}', system_prompt)
 
 
 class TestRateLimitConfig:
@@ -170,5 +202,49 @@ class TestBotCommands:
         assert 'CommandHandler("stats"' in bot_content
 
 
+class TestQueryRouting:
+    """Tests for the simple/complex query classifier."""
+    
+    def test_article_lookup_is_simple(self):
+        assert is_simple_query("qué dice el art 131")
+        assert is_simple_query("Artículo 135 de la Ley 769")
+    
+    def test_definition_is_simple(self):
+        assert is_simple_query("¿Qué es el RUNT?")
+    
+    def test_defense_question_is_complex(self):
+        assert not is_simple_query("cómo tumbo una fotomulta del art 131")
+        assert not is_simple_query("qué es el procedimiento para impugnar")
+    
+    def test_long_question_is_complex(self):
+        query = "qué dice el artículo 131 sobre las multas que me pusieron ayer en la autopista norte de Bogotá"
+        assert not is_simple_query(query)
+    
+    def test_simple_query_routed_to_simple_model(self):
+        """Test a lookup gets the simple model and a capped completion budget."""
+        assert route_query("¿Qué es el SOAT?", "gpt-4o", "gpt-4o-mini", 1500) == (
+            "gpt-4o-mini", SIMPLE_QUERY_MAX_TOKENS
+        )
+    
+    def test_simple_budget_never_raised(self):
+        assert route_query("¿Qué es el SOAT?", "gpt-4o", "gpt-4o-mini", 200) == ("gpt-4o-mini", 200)
+    
+    def test_complex_query_keeps_full_model(self):
+        assert route_query("cómo impugno un comparendo", "gpt-4o", "gpt-4o-mini", 1500) == ("gpt-4o", 1500)
+    
+    def test_bot_uses_whisper_prompt(self):
+        content = (Path(__file__).parent.parent / "src" / "bot.py").read_text()
+        assert "prompt=WHISPER_PROMPT" in content
+
+
+class TestDocumentConversation:
+    """Tests for the /documento handler wiring (behaviour is in test_document_flow)."""
+    
+    def test_updates_serialized_per_chat(self):
+        """Test concurrent updates go through the per-chat serializing processor."""
+        content = (Path(__file__).parent.parent / "src" / "bot.py").read_text()
+        assert ".concurrent_updates(ChatSerialUpdateProcessor(CONCURRENT_UPDATES))" in content
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
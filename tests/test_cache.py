@@ -0,0 +1,177 @@
+"""
+Tests for the semantic answer cache
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+np = pytest.importorskip("numpy")
+
+from src.cache import SemanticCache, LRUCache, FileCache
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class TestSemanticCache:
+    """Tests for SemanticCache lookups and eviction."""
+    
+    @pytest.fixture
+    def rng(self):
+        return np.random.default_rng(42)
+    
+    def test_exact_hit(self, rng):
+        """Test the same embedding returns the cached value."""
+        cache = SemanticCache(dim=64)
+        query = unit(rng.standard_normal(64))
+        cache.put(query, "respuesta")
+        assert cache.get(query) == "respuesta"
+    
+    def test_near_duplicate_hit(self, rng):
+        """Test a slightly perturbed embedding still hits."""
+        cache = SemanticCache(dim=64, threshold=0.95)
+        query = unit(rng.standard_normal(64))
+        cache.put(query, "respuesta")
+        near = unit(query + 0.05 * unit(rng.standard_normal(64)))
+        assert cache.get(near) == "respuesta"
+    
+    def test_unrelated_miss(self, rng):
+        """Test an unrelated embedding misses."""
+        cache = SemanticCache(dim=64)
+        cache.put(unit(rng.standard_normal(64)), "respuesta")
+        assert cache.get(unit(rng.standard_normal(64))) is None
+        assert cache.misses == 1
+    
+    def test_evicts_least_recently_used(self, rng):
+        """Test entries beyond maxsize are evicted oldest first."""
+        cache = SemanticCache(dim=64, maxsize=2)
+        a, b, c = (unit(rng.standard_normal(64)) for _ in range(3))
+        cache.put(a, "a")
+        cache.put(b, "b")
+        assert cache.get(a) == "a"  # refresh a
+        cache.put(c, "c")
+        assert len(cache) == 2
+        assert cache.get(b) is None
+        assert cache.get(a) == "a"
+
+
+
+class TestLRUCache:
+    """Tests for the exact-key LRU cache."""
+    
+    def test_get_put(self):
+        """Test stored values are returned and missing keys give None."""
+        cache = LRUCache(maxsize=2)
+        cache.put(("v1", "multa", "text"), "respuesta")
+        assert cache.get(("v1", "multa", "text")) == "respuesta"
+        assert cache.get(("v2", "multa", "text")) is None
+    
+    def test_evicts_least_recently_used(self):
+        """Test the least recently used key is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert len(cache) == 2
+
+
+class TestFileCache:
+    """Tests for the on-disk byte cache."""
+    
+    def test_round_trip(self, tmp_path):
+        """Test stored bytes are returned for the same key."""
+        cache = FileCache(str(tmp_path), suffix=".mp3")
+        cache.put("Hola, ¿cómo estás?", b"ID3audio")
+        assert cache.get("Hola, ¿cómo estás?") == b"ID3audio"
+        assert "Hola, ¿cómo estás?" in cache
+    
+    def test_miss(self, tmp_path):
+        """Test an unknown key misses."""
+        cache = FileCache(str(tmp_path))
+        assert cache.get("nada") is None
+        assert "nada" not in cache
+    
+    def test_persists_across_instances(self, tmp_path):
+        """Test a new instance over the same directory sees earlier writes."""
+        FileCache(str(tmp_path), suffix=".mp3").put("clave", b"datos")
+        assert FileCache(str(tmp_path), suffix=".mp3").get("clave") == b"datos"
+    
+    def test_no_temp_files_left(self, tmp_path):
+        """Test writes leave only the final file behind."""
+        cache = FileCache(str(tmp_path), suffix=".mp3")
+        cache.put("clave", b"datos")
+        assert [p.suffix for p in tmp_path.iterdir()] == [".mp3"]
+    
+    def test_prunes_least_recently_used(self, tmp_path):
+        """Test outgrowing max_bytes deletes the least recently used files."""
+        import os
+        cache = FileCache(str(tmp_path), suffix=".mp3", max_bytes=250)
+        for i, key in enumerate(["a", "b", "c"]):
+            cache.put(key, b"x" * 100 if key != "c" else b"x" * 40)
+            os.utime(cache._path(key), (i, i))  # a oldest, c newest
+        os.utime(cache._path("a"), (10, 10))  # a used most recently
+        cache.put("d", b"x" * 100)
+        assert "a" in cache and "d" in cache
+        assert "b" not in cache
+
+
+class TestSemanticCachePersistence:
+    """Tests for saving and reloading the semantic cache."""
+    
+    METADATA = {"embedding_model": "text-embedding-3-small", "index_version": "abc123"}
+    
+    def test_round_trip(self, tmp_path):
+        """Test saved entries hit after reloading into a new cache."""
+        rng = np.random.default_rng(7)
+        path = str(tmp_path / "cache.npz")
+        cache = SemanticCache(dim=64)
+        queries = [unit(rng.standard_normal(64)) for _ in range(3)]
+        for i, query in enumerate(queries):
+            cache.put(query, {"text": f"respuesta {i}"})
+        cache.save(path, self.METADATA)
+        
+        restored = SemanticCache(dim=64)
+        assert restored.load(path, self.METADATA) == 3
+        assert restored.get(queries[1]) == {"text": "respuesta 1"}
+    
+    def test_metadata_mismatch_loads_nothing(self, tmp_path):
+        """Test entries from another model or index are dropped."""
+        path = str(tmp_path / "cache.npz")
+        cache = SemanticCache(dim=64)
+        cache.put(unit(np.ones(64)), {"text": "respuesta"})
+        cache.save(path, self.METADATA)
+        
+        restored = SemanticCache(dim=64)
+        assert restored.load(path, {**self.METADATA, "index_version": "def456"}) == 0
+        assert len(restored) == 0
+    
+    def test_missing_file(self, tmp_path):
+        """Test a missing file is a cold start, not an error."""
+        assert SemanticCache(dim=64).load(str(tmp_path / "nada.npz"), self.METADATA) == 0
+    
+    def test_keeps_most_recent_when_smaller(self, tmp_path):
+        """Test reloading into a smaller cache keeps the most recently used entries."""
+        rng = np.random.default_rng(8)
+        path = str(tmp_path / "cache.npz")
+        cache = SemanticCache(dim=64)
+        queries = [unit(rng.standard_normal(64)) for _ in range(3)]
+        for i, query in enumerate(queries):
+            cache.put(query, i)
+        cache.save(path, self.METADATA)
+        
+        restored = SemanticCache(dim=64, maxsize=2)
+        restored.load(path, self.METADATA)
+        assert restored.get(queries[0]) is None
+        assert restored.get(queries[2]) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
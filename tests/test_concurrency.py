@@ -0,0 +1,206 @@
+"""
+Tests for the asyncio coordination helpers
+"""
+import sys
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.concurrency import InFlight, KeyedLocks, ChatSerialProcessing
+
+
+def normalize(question):
+    return " ".join(question.lower().split())
+
+
+class TestInFlight:
+    """Tests for sharing an in-progress answer between identical questions."""
+
+    def test_concurrent_callers_share_one_call(self):
+        """Test two users asking the same question trigger one upstream call."""
+        calls = []
+
+        async def answer(question):
+            calls.append(question)
+            await asyncio.sleep(0.01)
+            return f"respuesta a {question}"
+
+        async def run():
+            flight = InFlight()
+            results = await asyncio.gather(*(
+                flight.run(normalize(q), lambda q=q: answer(normalize(q)))
+                for q in ["¿Qué es el SOAT?", "¿qué es el  soat?"]
+            ))
+            return flight, results
+
+        flight, results = asyncio.run(run())
+        assert calls == ["¿qué es el soat?"]
+        assert results == [(True, "respuesta a ¿qué es el soat?"), (False, "respuesta a ¿qué es el soat?")]
+        assert normalize("¿Qué es el SOAT?") not in flight
+
+    def test_different_keys_run_separately(self):
+        async def run():
+            flight = InFlight()
+            return await asyncio.gather(
+                flight.run("a", lambda: asyncio.sleep(0.01, result="A")),
+                flight.run("b", lambda: asyncio.sleep(0.01, result="B")),
+            )
+
+        assert asyncio.run(run()) == [(True, "A"), (True, "B")]
+
+    def test_cancelled_waiter_leaves_call_running(self):
+        """Test cancelling one waiter doesn't cancel the call or other waiters."""
+        async def run():
+            flight = InFlight()
+            leader = asyncio.ensure_future(flight.run("soat", lambda: asyncio.sleep(0.05, result="ok")))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(flight.run("soat", lambda: None)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            waiters[0].cancel()
+            return await asyncio.gather(leader, waiters[1], waiters[0], return_exceptions=True)
+
+        leader, waiter, cancelled = asyncio.run(run())
+        assert leader == (True, "ok")
+        assert waiter == (False, "ok")
+        assert isinstance(cancelled, asyncio.CancelledError)
+
+    def test_cancelled_leader_releases_waiters(self):
+        """Test waiters get None, not a cancellation, if the caller that runs the call goes away."""
+        async def run():
+            flight = InFlight()
+            leader = asyncio.ensure_future(flight.run("soat", lambda: asyncio.sleep(1, result="ok")))
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(flight.run("soat", lambda: None))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await waiter, "soat" in flight
+
+        assert asyncio.run(run()) == ((False, None), False)
+
+    def test_failed_call_raises_only_for_its_caller(self):
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def run():
+            flight = InFlight()
+            return await asyncio.gather(
+                flight.run("soat", fail),
+                flight.run("soat", fail),
+                return_exceptions=True
+            )
+
+        leader, waiter = asyncio.run(run())
+        assert isinstance(leader, ValueError)
+        assert waiter == (False, None)
+
+
+class TestKeyedLocks:
+    """Tests for per-chat serialization of updates."""
+
+    def run_updates(self, updates):
+        """Run (chat_id, text) updates concurrently, each a two-step handler."""
+        locks = KeyedLocks()
+        log = []
+
+        async def handle(chat_id, text):
+            async with locks.hold(chat_id):
+                log.append((chat_id, text, "start"))
+                await asyncio.sleep(0.01)
+                log.append((chat_id, text, "end"))
+
+        async def run():
+            await asyncio.gather(*(handle(chat_id, text) for chat_id, text in updates))
+
+        asyncio.run(run())
+        return locks, log
+
+    def test_same_chat_runs_in_order(self):
+        """Test a chat's updates don't interleave (e.g. two /documento answers)."""
+        _, log = self.run_updates([(1, "nombre"), (1, "cédula"), (1, "dirección")])
+        assert log == [
+            (1, "nombre", "start"), (1, "nombre", "end"),
+            (1, "cédula", "start"), (1, "cédula", "end"),
+            (1, "dirección", "start"), (1, "dirección", "end"),
+        ]
+
+    def test_different_chats_run_concurrently(self):
+        _, log = self.run_updates([(1, "a"), (2, "b")])
+        assert [step for _, _, step in log] == ["start", "start", "end", "end"]
+
+    def test_locks_dropped_when_idle(self):
+        locks, _ = self.run_updates([(1, "a"), (1, "b"), (2, "c")])
+        assert len(locks) == 0
+
+    def test_cancelled_waiter_releases_its_slot(self):
+        async def run():
+            locks = KeyedLocks()
+
+            async def hold(seconds):
+                async with locks.hold("chat"):
+                    await asyncio.sleep(seconds)
+
+            first = asyncio.ensure_future(hold(0.02))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(hold(0))
+            await asyncio.sleep(0)
+            second.cancel()
+            await asyncio.gather(first, second, return_exceptions=True)
+            return len(locks)
+
+        assert asyncio.run(run()) == 0
+
+
+class TestChatSerialProcessing:
+    """Tests for the update processor's per-chat ordering."""
+
+    def process(self, updates):
+        """Feed (chat_id, text) updates to do_process_update concurrently."""
+        processor = ChatSerialProcessing()
+        log = []
+
+        async def handle(chat_id, text):
+            log.append((chat_id, text, "start"))
+            await asyncio.sleep(0.01)
+            log.append((chat_id, text, "end"))
+
+        def update(chat_id):
+            chat = None if chat_id is None else SimpleNamespace(id=chat_id)
+            return SimpleNamespace(effective_chat=chat)
+
+        async def run():
+            await asyncio.gather(*(
+                processor.do_process_update(update(chat_id), handle(chat_id, text))
+                for chat_id, text in updates
+            ))
+
+        asyncio.run(run())
+        return processor, log
+
+    def test_same_chat_updates_run_in_order(self):
+        _, log = self.process([(1, "nombre"), (1, "cédula")])
+        assert log == [
+            (1, "nombre", "start"), (1, "nombre", "end"),
+            (1, "cédula", "start"), (1, "cédula", "end"),
+        ]
+
+    def test_different_chats_overlap(self):
+        _, log = self.process([(1, "a"), (2, "b")])
+        assert log[:2] == [(1, "a", "start"), (2, "b", "start")]
+
+    def test_updates_without_chat_not_serialized(self):
+        """Test e.g. inline queries, which have no chat, run without a lock."""
+        _, log = self.process([(None, "a"), (None, "b")])
+        assert [step for _, _, step in log] == ["start", "start", "end", "end"]
+
+    def test_chat_locks_dropped_after_updates(self):
+        processor, _ = self.process([(1, "a"), (1, "b"), (2, "c")])
+        assert len(processor._chats) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,167 @@
+"""
+Tests for the OpenAI request dispatchers
+"""
+import sys
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import dispatcher as dispatcher_module
+from src.dispatcher import RequestDispatcher, EmbeddingBatcher, _retry_delay
+
+
+class RateLimited(Exception):
+    """Stand-in for openai.RateLimitError."""
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("rate limited")
+        headers = {"retry-after": retry_after} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class FakeCompletions:
+    """Streams two chunks per call, recording concurrency; fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.calls = []
+        self.failures = failures
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.failures:
+            self.failures -= 1
+            raise RateLimited(retry_after="0")
+        return self._chunks(kwargs["n"])
+
+    async def _chunks(self, n):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        for part in ("respuesta ", str(n)):
+            await asyncio.sleep(0.005)
+            yield part
+        self.in_flight -= 1
+
+
+def fake_client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+async def collect(dispatcher, **kwargs):
+    return "".join([chunk async for chunk in dispatcher.stream(**kwargs)])
+
+
+class TestRequestDispatcher:
+    """Tests for stream concurrency bounds and retries."""
+
+    def test_stream_yields_chunks(self):
+        """Test concurrent streams each get their own chunks."""
+        completions = FakeCompletions()
+
+        async def run():
+            dispatcher = RequestDispatcher(fake_client(completions))
+            return await asyncio.gather(*(collect(dispatcher, n=i) for i in range(10)))
+
+        assert asyncio.run(run()) == [f"respuesta {i}" for i in range(10)]
+        assert all(call["stream"] for call in completions.calls)
+
+    def test_concurrency_is_bounded(self):
+        """Test no more than max_concurrency streams are open."""
+        completions = FakeCompletions()
+
+        async def run():
+            dispatcher = RequestDispatcher(fake_client(completions), max_concurrency=3)
+            await asyncio.gather(*(collect(dispatcher, n=i) for i in range(12)))
+
+        asyncio.run(run())
+        assert len(completions.calls) == 12
+        assert completions.max_in_flight <= 3
+
+    def test_rate_limit_is_retried(self):
+        """Test a 429 is retried and the caller gets the eventual stream."""
+        completions = FakeCompletions(failures=2)
+        dispatcher = RequestDispatcher(fake_client(completions))
+
+        assert asyncio.run(collect(dispatcher, n=1)) == "respuesta 1"
+        assert len(completions.calls) == 3
+
+    def test_other_errors_propagate(self):
+        """Test non rate-limit errors reach the caller without retries."""
+        class Broken:
+            calls = 0
+
+            async def create(self, **kwargs):
+                Broken.calls += 1
+                raise ValueError("bad request")
+
+        dispatcher = RequestDispatcher(fake_client(Broken()))
+        with pytest.raises(ValueError):
+            asyncio.run(collect(dispatcher, n=1))
+        assert Broken.calls == 1
+
+
+class FakeEmbeddings:
+    """Returns [len(text)] as each text's embedding, in shuffled order."""
+
+    def __init__(self, failures=0):
+        self.calls = []
+        self.failures = failures
+
+    async def create(self, model, input, dimensions=None):
+        self.calls.append(list(input))
+        if self.failures:
+            self.failures -= 1
+            raise RateLimited(retry_after="0")
+        data = [SimpleNamespace(index=i, embedding=[float(len(t))]) for i, t in enumerate(input)]
+        return SimpleNamespace(data=data[::-1])
+
+
+class TestEmbeddingBatcher:
+    """Tests for coalescing query embeddings into list-input requests."""
+
+    def run_batch(self, embeddings, texts):
+        async def run():
+            client = SimpleNamespace(embeddings=embeddings)
+            batcher = EmbeddingBatcher(client, "text-embedding-3-small", 1536)
+            results = await asyncio.gather(*(batcher.embed(t) for t in texts))
+            await batcher.close()
+            return results
+        return asyncio.run(run())
+
+    def test_concurrent_queries_share_one_request(self):
+        """Test queries within a window go out as one request."""
+        embeddings = FakeEmbeddings()
+        texts = ["multa", "fotomulta", "pico y placa"]
+        results = self.run_batch(embeddings, texts)
+        assert len(embeddings.calls) == 1
+        assert results == [[5.0], [9.0], [12.0]]
+
+    def test_rate_limit_is_retried(self):
+        """Test a 429 on the batch is retried for every caller."""
+        embeddings = FakeEmbeddings(failures=1)
+        assert self.run_batch(embeddings, ["multa", "soat"]) == [[5.0], [4.0]]
+        assert len(embeddings.calls) == 2
+
+
+class TestRetryDelay:
+    """Tests for the 429 backoff policy."""
+
+    def test_honours_retry_after(self):
+        assert _retry_delay(RateLimited(retry_after="3"), attempt=0) == 3.0
+
+    def test_caps_retry_after(self):
+        delay = _retry_delay(RateLimited(retry_after="600"), attempt=0)
+        assert delay == dispatcher_module.RETRY_MAX_DELAY
+
+    def test_backoff_without_header(self):
+        delay = _retry_delay(RateLimited(), attempt=2)
+        assert 0 < delay <= dispatcher_module.RETRY_BASE_DELAY * 4
+
+    def test_other_errors_not_retried(self):
+        assert _retry_delay(ValueError("boom"), attempt=0) is None
@@ -0,0 +1,118 @@
+"""
+Tests for the /documento data-collection steps
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.document_flow import (
+    NOMBRE, CEDULA, TELEFONO, EMAIL, FECHA, PLACA, HECHOS,
+    DOCUMENT_FIELDS, FIELD_PATTERNS, store_answer
+)
+
+ANSWERS = {
+    "nombre": "Juan Carlos Pérez García",
+    "cedula": "1.023.456.789",
+    "direccion": "Calle 123 # 45-67, Bogotá",
+    "telefono": "300 123 4567",
+    "email": "juan.perez@gmail.com",
+    "ciudad": "Bogotá D.C.",
+    "comparendo": "11001000000012345678",
+    "fecha": "15 de enero de 2022",
+    "placa": "ABC123",
+}
+
+
+class TestDocumentSteps:
+    """Tests for walking through the table-driven field steps."""
+
+    def test_steps_chain_to_hechos(self):
+        """Test answering each prompt in turn fills every field and ends at HECHOS."""
+        user_data = {}
+        state = NOMBRE
+        while state != HECHOS:
+            key = DOCUMENT_FIELDS[state][0]
+            answered, invalid = store_answer(user_data, state, ANSWERS[key])
+            assert (answered, invalid) == (state, None)
+            state = DOCUMENT_FIELDS[answered][2]
+        assert user_data == ANSWERS
+
+    def test_answers_stored_in_given_mapping(self):
+        """Test answers go to the caller's per-user storage, stripped."""
+        user_data = {"template": "prescripcion"}
+        store_answer(user_data, CEDULA, "  79876543 \n")
+        assert user_data == {"template": "prescripcion", "cedula": "79876543"}
+
+    def test_all_fields_in_one_message(self):
+        """Test the first step accepts every field, one per line."""
+        user_data = {}
+        text = "\n".join(ANSWERS.values())
+        assert store_answer(user_data, NOMBRE, text) == (PLACA, None)
+        assert user_data == ANSWERS
+
+    def test_blank_lines_ignored_in_one_message(self):
+        user_data = {}
+        text = "\n\n".join(f"  {value}  " for value in ANSWERS.values())
+        assert store_answer(user_data, NOMBRE, text) == (PLACA, None)
+        assert user_data == ANSWERS
+
+    def test_multiline_answer_after_first_step_is_one_field(self):
+        """Test only the first step splits lines into fields."""
+        user_data = {}
+        text = "\n".join(ANSWERS.values())
+        store_answer(user_data, DOCUMENT_FIELDS[CEDULA][2], text)
+        assert list(user_data) == ["direccion"]
+
+    def test_invalid_answer_reasks_same_step(self):
+        """Test a failed check reports the field and stores nothing."""
+        user_data = {}
+        assert store_answer(user_data, EMAIL, "juan.perez") == (EMAIL, EMAIL)
+        assert user_data == {}
+
+    def test_invalid_line_in_one_message_stores_nothing(self):
+        """Test one bad field in an all-in-one message rejects the whole message."""
+        user_data = {}
+        answers = dict(ANSWERS, telefono="llámame")
+        text = "\n".join(answers.values())
+        assert store_answer(user_data, NOMBRE, text) == (NOMBRE, TELEFONO)
+        assert user_data == {}
+
+
+class TestFieldPatterns:
+    """Tests for the per-field format checks."""
+
+    VALID = {
+        CEDULA: ["1.023.456.789", "79876543", "52 123 456"],
+        TELEFONO: ["3001234567", "+57 300 123 4567", "(601) 555-1234"],
+        EMAIL: ["juan.perez@gmail.com", "a@b.co"],
+        FECHA: ["15 de enero de 2022", "3 marzo 2021", "1 de Diciembre del 2020",
+                "15/01/2022", "15-01-22", "2022-01-15"],
+        PLACA: ["ABC123", "abc-123", "XYZ 987", "ABC12D"],
+    }
+    INVALID = {
+        CEDULA: ["juan", "12", "abc123456"],
+        TELEFONO: ["llámame", "123"],
+        EMAIL: ["juan.perez", "juan @gmail.com", "@gmail.com"],
+        FECHA: ["ayer", "enero de 2022", "15 de juernes de 2022", "32/13"],
+        PLACA: ["1234", "ABCD123", "placa abc123"],
+    }
+
+    @pytest.mark.parametrize("state,value", [(s, v) for s, values in VALID.items() for v in values])
+    def test_accepts_valid_input(self, state, value):
+        assert FIELD_PATTERNS[state].match(value)
+
+    @pytest.mark.parametrize("state,value", [(s, v) for s, values in INVALID.items() for v in values])
+    def test_rejects_garbage(self, state, value):
+        assert not FIELD_PATTERNS[state].match(value)
+
+    def test_free_text_fields_not_checked(self):
+        """Test name, address, city and ticket number take any answer."""
+        checked = {DOCUMENT_FIELDS[state][0] for state in FIELD_PATTERNS}
+        assert checked == {"cedula", "telefono", "email", "fecha", "placa"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
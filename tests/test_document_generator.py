@@ -9,7 +9,7 @@ import pytest
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.document_generator import DerechoPeticionGenerator
+from src.document_generator import DerechoPeticionGenerator, format_fecha, render_document
 
 
 class TestDerechoPeticionGenerator:
@@ -51,6 +51,11 @@ class TestDerechoPeticionGenerator:
         for template in expected:
             assert template in templates
     
+    def test_available_templates_returns_copy(self, generator):
+        """Test changing the returned dict doesn't change the shared templates."""
+        generator.get_available_templates().pop("prescripcion")
+        assert "prescripcion" in generator.get_available_templates()
+    
     def test_generate_prescripcion_pdf(self, generator, sample_data):
         """Test prescripción document generation."""
         sample_data["template_type"] = "prescripcion"
@@ -145,6 +150,52 @@ class TestDerechoPeticionGenerator:
         # Señalización should reference 500 metros
         assert "500" in templates["fotomulta_señalizacion"]["legal_basis"]
 
+    
+    def test_template_paragraphs_parsed_once(self, generator):
+        """Test the template texts are pre-parsed into stripped paragraphs."""
+        for template_type, template in generator.TEMPLATES.items():
+            legal_paras, request_paras = generator._paragraphs[template_type]
+            assert legal_paras and request_paras
+            texts = [p.text for p in legal_paras + request_paras]
+            assert all(t == t.strip() and t for t in texts)
+            assert "\n\n".join(p.text for p in legal_paras) == template["legal_basis"].strip()
+    
+    def test_styles_shared_between_generators(self, generator):
+        """Test the style sheet is built once per process, not per generator."""
+        assert DerechoPeticionGenerator().styles is generator.styles
+        assert generator.styles['Justified'].fontSize == 11
+    
+    def test_repeated_builds_are_identical(self, generator, sample_data):
+        """Test reusing the paragraph prototypes doesn't change later documents."""
+        from reportlab import rl_config
+        invariant = rl_config.invariant
+        rl_config.invariant = 1  # fixed creation date and document ID
+        try:
+            sample_data["hechos_adicionales"] = "Nunca recibí notificación. " * 120  # spans pages
+            first = generator.generate_document(**sample_data).getvalue()
+            second = generator.generate_document(**sample_data).getvalue()
+            fresh = DerechoPeticionGenerator().generate_document(**sample_data).getvalue()
+        finally:
+            rl_config.invariant = invariant
+        assert first == second == fresh
+    
+    def test_render_document_in_worker_process(self, sample_data):
+        """Test PDFs render in a spawned worker process and come back as bytes."""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            content = pool.submit(render_document, **sample_data).result(timeout=60)
+        assert isinstance(content, bytes)
+        assert content[:4] == b'%PDF'
+
+
+class TestFormatFecha:
+    """Tests for the Spanish document date."""
+    
+    def test_spanish_month_names(self):
+        from datetime import datetime
+        assert format_fecha(datetime(2024, 3, 5)) == "05 de marzo de 2024"
+        assert format_fecha(datetime(2023, 12, 31)) == "31 de diciembre de 2023"
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
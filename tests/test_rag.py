@@ -11,6 +11,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 # Import only the utility functions that don't trigger chromadb
 # We test the core logic without the heavy dependencies
+from src.compaction import compact_chunks
+from src.routing import normalize_query
 
 
 def extract_metadata_from_text(text: str, source_id: str):
@@ -275,6 +277,43 @@ class TestSourceMetadata:
             for field in required_fields:
                 assert field in meta, f"Source {source_id} missing field {field}"
 
+class TestNormalizeQuery:
+    """Tests for query normalization used by the embedding cache"""
+    
+    def test_case_and_whitespace_collapse(self):
+        """Queries differing only in case/spacing share a cache key"""
+        a = normalize_query("  ¿Cuánto es la MULTA por   cinturón? ")
+        b = normalize_query("¿cuánto es la multa por cinturón?")
+        assert a == b
+    
+    def test_distinct_queries_differ(self):
+        """Different questions keep different keys"""
+        assert normalize_query("multa por cinturón") != normalize_query("multa por casco")
+
+
+class TestCompactChunks:
+    """Tests for prompt context compaction."""
+    
+    def test_collapses_whitespace(self):
+        assert compact_chunks(["ARTÍCULO   131.\n\n\n  Multas   tipo A"]) == ["ARTÍCULO 131.\nMultas tipo A"]
+    
+    def test_drops_separator_and_stray_lines(self):
+        doc = "=====\nTÍTULO I\n.\n-----\nDisposiciones generales"
+        assert compact_chunks([doc]) == ["TÍTULO I\nDisposiciones generales"]
+    
+    def test_dedupes_long_sentences_across_chunks(self):
+        sentence = "Las normas del presente Código rigen en todo el territorio nacional."
+        result = compact_chunks([f"ARTÍCULO 1. {sentence}", f"Norma Anterior\n{sentence} Texto nuevo."])
+        assert result == [f"ARTÍCULO 1. {sentence}", "Norma Anterior\nTexto nuevo."]
+    
+    def test_keeps_short_repeats(self):
+        result = compact_chunks(["PARÁGRAFO.", "PARÁGRAFO."])
+        assert result == ["PARÁGRAFO.", "PARÁGRAFO."]
+    
+    def test_fully_duplicate_chunk_becomes_empty(self):
+        doc = "Las autoridades de tránsito promoverán la difusión de este código."
+        assert compact_chunks([doc, doc]) == [doc, ""]
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
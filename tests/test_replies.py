@@ -0,0 +1,54 @@
+"""
+Tests for the reply text helpers
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.replies import split_message, MESSAGE_PART_CHARS, TELEGRAM_MAX_MESSAGE_CHARS
+
+
+class TestSplitMessage:
+    """Tests for splitting long answers into Telegram messages."""
+
+    def test_short_text_is_one_part(self):
+        assert split_message("La multa es de 15 SMDLV.") == ["La multa es de 15 SMDLV."]
+
+    def test_empty_text_has_no_parts(self):
+        assert split_message("") == []
+
+    def test_parts_fit_with_streaming_cursor(self):
+        """Test every part plus the ' ▌' cursor fits in one message."""
+        text = "El artículo 131 establece las multas. " * 400
+        parts = split_message(text)
+        assert len(parts) > 1
+        assert all(len(part) <= MESSAGE_PART_CHARS for part in parts)
+        assert all(len(f"{part} ▌") <= TELEGRAM_MAX_MESSAGE_CHARS for part in parts)
+
+    def test_prefers_paragraph_breaks(self):
+        paragraph = "x" * 60
+        text = "\n\n".join([paragraph] * 3)
+        assert split_message(text, limit=150) == [f"{paragraph}\n\n{paragraph}", paragraph]
+
+    def test_no_text_lost_at_word_breaks(self):
+        words = [f"palabra{i}" for i in range(2000)]
+        parts = split_message(" ".join(words), limit=500)
+        assert " ".join(parts).split() == words
+
+    def test_hard_cut_without_separators(self):
+        assert split_message("a" * 25, limit=10) == ["a" * 10, "a" * 10, "a" * 5]
+
+    def test_streamed_prefix_keeps_earlier_parts(self):
+        """Test parts settled while streaming stay the same as the text grows."""
+        text = " ".join(f"Numeral {i}: sanción aplicable." for i in range(600))
+        final = split_message(text)
+        for end in range(MESSAGE_PART_CHARS, len(text), 997):
+            streamed = split_message(text[:end].strip())
+            assert streamed[:-1] == final[:len(streamed) - 1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,50 @@
+"""
+Tests for joining transcripts of overlapping voice-note segments
+"""
+import sys
+from pathlib import Path
+import pytest
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.transcription import merge_transcripts
+
+
+class TestMergeTranscripts:
+    """Tests for dropping the words heard twice at segment cuts."""
+
+    def test_repeated_words_dropped(self):
+        texts = ["La multa por exceso de velocidad es de", "es de quince salarios mínimos."]
+        assert merge_transcripts(texts) == "La multa por exceso de velocidad es de quince salarios mínimos."
+
+    def test_case_and_punctuation_ignored(self):
+        """Test Whisper's capitalization and punctuation at the cut don't block the match."""
+        texts = ["Según el artículo 131, la sanción.", "La sanción es de 15 SMDLV."]
+        assert merge_transcripts(texts) == "Según el artículo 131, la sanción es de 15 SMDLV."
+
+    def test_word_clipped_at_end_replaced(self):
+        """Test a word cut off at the end of one segment is taken whole from the next."""
+        texts = ["El código de trán", "de tránsito establece"]
+        assert merge_transcripts(texts) == "El código de tránsito establece"
+
+    def test_word_clipped_at_start_dropped(self):
+        texts = ["El código de tránsito establece", "sito establece las multas"]
+        assert merge_transcripts(texts) == "El código de tránsito establece las multas"
+
+    def test_three_segments(self):
+        texts = ["me pusieron un comparendo", "un comparendo por no", "por no llevar el SOAT"]
+        assert merge_transcripts(texts) == "me pusieron un comparendo por no llevar el SOAT"
+
+    def test_no_overlap_joins_with_space(self):
+        assert merge_transcripts(["Primera parte.", "Segunda parte."]) == "Primera parte. Segunda parte."
+
+    def test_empty_segments_skipped(self):
+        assert merge_transcripts(["hola", "  ", "", "mundo"]) == "hola mundo"
+
+    def test_single_segment_unchanged(self):
+        assert merge_transcripts(["¿Qué es el SOAT?"]) == "¿Qué es el SOAT?"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])